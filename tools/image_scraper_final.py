@@ -6,30 +6,64 @@ Reads URLs from a README/Links markdown file and downloads images
 from supported sources into per-source folders inside ./images.
 
 Features
-- Modular, per-source extractors (Yelp, DoorDash, NorthJersey, Grubhub, generic)
+- Single-pass DOM extractor with per-source rules (Yelp, DoorDash, NorthJersey, Grubhub, generic)
 - Requests+BeautifulSoup first; optional Playwright fallback for JS-heavy pages
+- Pluggable HTML parser backends (html.parser, lxml, html5lib, selectolax) with a strained mode
+- Embedded JSON state (__NEXT_DATA__, ld+json, Apollo/Redux caches) mined for images and item names
 - Robust URL extraction from Markdown (raw links, <angle>, and [text](url))
-- Deduplicated downloads with SHA1 filenames and proper extensions via Content-Type
+- Deduplicated downloads with SHA1 filenames and extensions sniffed from the body's magic bytes
 - Session with retries, polite rate limiting, and user-agent
 - Per-page Referer on image downloads to bypass hotlink/CDN checks
+- Optional worker pool for concurrent downloads
+- Page-level scheduler crawling different sources concurrently into one shared download pool
+- Streaming extraction: URLs flow through a bounded queue to the downloaders, deduped against a run-wide seen-set
+- Optional gallery pagination (Yelp ?start=N, NorthJersey next-slide links) fetched concurrently up to --max-pages
+- Per-host token-bucket rate limiting (configurable per host/domain pattern)
+- Persistent JSONL download index so reruns skip already-fetched images
+- Conditional GET (ETag / If-Modified-Since) for cached pages and, with --revalidate, images
+- Content-addressed blob store (images/.blobs) hardlinked into per-source folders
+- Resumable downloads: bodies stream into .part files, large ones resume via HTTP Range after a failure or kill
+- Optional perceptual-hash (dHash + BK-tree) near-duplicate pruning after download (needs Pillow)
+- Optional responsive variants (AVIF/WEBP/JPEG width ladder) rendered in a process pool, cached by content hash
+- Optional BlurHash + tiny base64 LQIP placeholders (NumPy) written to images/placeholders.json
+- images/manifest.json: per asset source page, alt/caption/item name, dimensions, bytes, hash and variants
+- Optional menu matching: token/trigram index over data/menu.json names proposes an image per id as a JSON Patch
+- Optional asyncio/aiohttp engine (--engine async) reusing the same extractors
 - Playwright-aware re-download on 403/406 using browser cookies
+- One long-lived Chromium (per-host contexts, bounded pages) shared by every Playwright call
+- Optional capture of image bodies straight from Playwright network responses (--pw-capture)
+- Playwright pages block fonts/CSS/media/trackers and stop scrolling once the page settles
 - Broad image type support (AVIF/WEBP/SVG/ICO/HEIC/JP2/JXL/etc.) and <picture><source> parsing
+- Magic-byte sniffing on the first chunk: non-images, tiny pixels and oversized bodies are aborted early
+- Header probing (JPEG SOF, PNG, GIF, WEBP, AVIF ispe) drops images narrower than --min-width before the body
+- srcset/<picture> resolver picking one candidate per image (--max-width, --prefer-format)
+- Per-CDN URL canonicalization so size/format variants of one asset are fetched once
 - Clear logging and summary report
 """
 import argparse
+import asyncio
+import base64
+import fnmatch
 import hashlib
-import mimetypes
+import io
+import json
 import os
+import queue
 import re
+import shutil
 import sys
+import tempfile
+import threading
 import time
-from dataclasses import dataclass
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set
-from urllib.parse import urlparse, urljoin
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from requests.adapters import HTTPAdapter, Retry
 
 # ------------------------------ Config & Utilities ------------------------------
@@ -46,27 +80,6 @@ IMG_EXT_WHITELIST = {
     ".bmp", ".tiff", ".tif", ".svg", ".ico", ".jfif", ".jxl",
     ".jp2", ".jpx", ".jpm", ".jxr", ".heic", ".heif"
 }
-CONTENT_TYPE_TO_EXT = {
-    "image/pjpeg": ".jpg",
-    "image/jpeg": ".jpg",
-    "image/jpg": ".jpg",
-    "image/png": ".png",
-    "image/gif": ".gif",
-    "image/webp": ".webp",
-    "image/avif": ".avif",
-    "image/bmp": ".bmp",
-    "image/tiff": ".tiff",
-    "image/svg+xml": ".svg",
-    "image/x-icon": ".ico",
-    "image/vnd.microsoft.icon": ".ico",
-    "image/heic": ".heic",
-    "image/heif": ".heif",
-    "image/jxl": ".jxl",
-    "image/jxr": ".jxr",
-    "image/jp2": ".jp2",
-    "image/jpx": ".jpx",
-    "image/jpm": ".jpm",
-}
 
 DEFAULT_HEADERS = {
     "User-Agent": (
@@ -78,6 +91,49 @@ DEFAULT_HEADERS = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
 }
 
+# Per-host politeness overrides: fnmatch pattern on hostname -> (requests/sec, burst).
+# Image CDNs can take far more than the origin HTML hosts.
+DEFAULT_HOST_RATES: Dict[str, Tuple[float, float]] = {
+    "*.yelpcdn.com": (10.0, 20.0),
+    "*.cdn4dd.com": (10.0, 20.0),
+    "media-cdn.grubhub.com": (10.0, 20.0),
+    "res.cloudinary.com": (10.0, 20.0),
+    "*.gannett-cdn.com": (10.0, 20.0),
+}
+
+IMG_SRC_ATTRS = ("src", "data-src", "data-lazy", "data-original")
+DEFAULT_FORMAT_PREFERENCE = ("jpeg", "webp", "png", "avif")
+# srcset candidates within this width ratio of the best fit count as the same size
+SIMILAR_WIDTH = 0.8
+FORMAT_ALIASES = {"jpg": "jpeg", "pjpeg": "jpeg", "jfif": "jpeg", "tif": "tiff"}
+
+CSS_BG_IMAGE_RE = re.compile(r"background-image\s*:\s*url\((['\"]?)([^'\")]+)\1\)", re.I)
+FORMAT_PARAM_RE = re.compile(r"(?:^|&)(?:format|fm|f)=([a-z0-9]+)")
+CSS_URL_RE = re.compile(r"url\((['\"]?)([^'\")]+)\1\)", re.I)
+
+# Single-pass extraction rules: tag name (or "@style" for any element carrying a
+# style attribute) -> ImageScraper rule methods. Every source gets GENERIC_RULES;
+# SOURCE_RULES adds domain-specific ones on top.
+GENERIC_RULES: Dict[str, Tuple[str, ...]] = {
+    "img": ("_rule_img",),
+    "source": ("_rule_source",),
+    "meta": ("_rule_meta_image",),
+    "@style": ("_rule_bg_image",),
+}
+SOURCE_RULES: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "yelp": {"@style": ("_rule_yelp_css_photo",), "a": ("_rule_yelp_page_link",), "link": ("_rule_rel_next",)},
+    "northjersey": {"a": ("_rule_gallery_next",), "link": ("_rule_rel_next",)},
+    "grubhub": {"script": ("_rule_embedded_json",)},
+    "doordash": {"script": ("_rule_embedded_json",)},
+}
+
+# Inline `window.__X__ = {...}` state caches used by Apollo/Redux/Nuxt front ends
+STATE_ASSIGN_RE = re.compile(
+    r"(?:window\.)?(?:__APOLLO_STATE__|__PRELOADED_STATE__|__INITIAL_STATE__|__REDUX_STATE__|__NUXT__)\s*=\s*"
+)
+JSON_IMAGE_KEY_HINTS = ("image", "img", "photo", "thumbnail", "picture")
+JSON_NAME_KEYS = ("name", "title", "displayName", "itemName", "dishName")
+
 MARKDOWN_URL_RE = re.compile(
     r"""(?:
           <(https?://[^>\s]+)>               # <angle-bracketed>
@@ -90,21 +146,6 @@ MARKDOWN_URL_RE = re.compile(
 def sha1_name(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8", errors="ignore")).hexdigest()
 
-def guess_ext(url: str, content_type: Optional[str]) -> str:
-    path_ext = Path(urlparse(url).path).suffix.lower()
-    if path_ext in IMG_EXT_WHITELIST:
-        return path_ext
-    if content_type:
-        ct = content_type.split(";")[0].strip().lower()
-        if ct in CONTENT_TYPE_TO_EXT:
-            return CONTENT_TYPE_TO_EXT[ct]
-        # Fallback to mimetypes
-        ext = mimetypes.guess_extension(ct)
-        if ext:
-            return ext
-    # Conservative default
-    return ".jpg"
-
 def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
@@ -135,6 +176,1175 @@ def sanitize_img_url(u: str) -> str:
 def host_of(u: str) -> str:
     return (urlparse(u).hostname or "").lower()
 
+# ------------------------------ srcset / <picture> Resolution ------------------------------
+
+@dataclass(frozen=True)
+class SrcCandidate:
+    url: str
+    width: Optional[float] = None
+    density: Optional[float] = None
+    fmt: Optional[str] = None
+
+def url_format(url: str, mime: Optional[str] = None) -> Optional[str]:
+    """Best guess at an image format from a type= hint, a format query param, or the extension."""
+    if mime:
+        mime = mime.split(";")[0].strip().lower()
+        fmt = mime.split("/", 1)[1] if mime.startswith("image/") else mime
+        return FORMAT_ALIASES.get(fmt, fmt)
+    parsed = urlparse(url)
+    m = FORMAT_PARAM_RE.search(parsed.query.lower())
+    if m:
+        return FORMAT_ALIASES.get(m.group(1), m.group(1))
+    ext = Path(parsed.path).suffix.lower().lstrip(".")
+    return FORMAT_ALIASES.get(ext, ext) or None
+
+def parse_srcset(value: Optional[str], mime: Optional[str] = None) -> List[SrcCandidate]:
+    """Split a srcset into candidates following the HTML grammar: the URL runs to the
+    next whitespace (so CDN URLs with commas survive), then descriptors to the next comma."""
+    out: List[SrcCandidate] = []
+    if not value:
+        return out
+    i, n = 0, len(value)
+    while i < n:
+        while i < n and (value[i].isspace() or value[i] == ","):
+            i += 1
+        start = i
+        while i < n and not value[i].isspace():
+            i += 1
+        url, desc = value[start:i], ""
+        if url.endswith(","):
+            url = url.rstrip(",")
+        else:
+            start, depth = i, 0
+            while i < n and (value[i] != "," or depth):
+                depth += {"(": 1, ")": -1}.get(value[i], 0)
+                i += 1
+            desc = value[start:i]
+        if not url:
+            continue
+        width = density = None
+        for d in desc.split():
+            try:
+                if d.endswith("w"):
+                    width = float(d[:-1])
+                elif d.endswith("x"):
+                    density = float(d[:-1])
+            except ValueError:
+                pass
+        out.append(SrcCandidate(url, width, density, url_format(url, mime)))
+    return out
+
+def pick_srcset_candidate(cands: List[SrcCandidate], max_width: int, prefer: Iterable[str]) -> Optional[SrcCandidate]:
+    """Choose one candidate by width fit: the widest at or below max_width (or the
+    narrowest above it). Format only breaks ties among candidates of similar width,
+    and an unknown format ranks neutral. Without width descriptors, highest density wins."""
+    if not cands:
+        return None
+    prefer = list(prefer)
+    neutral = (len(prefer) - 1) / 2
+    rank = lambda c: prefer.index(c.fmt) if c.fmt in prefer else (len(prefer) if c.fmt else neutral)
+    sized = [c for c in cands if c.width]
+    if sized:
+        fitting = [c for c in sized if c.width <= max_width]
+        if fitting:
+            target = max(c.width for c in fitting)
+            pool = [c for c in fitting if c.width >= target * SIMILAR_WIDTH]
+        else:
+            target = min(c.width for c in sized)
+            pool = [c for c in sized if c.width * SIMILAR_WIDTH <= target]
+        return min(pool, key=lambda c: (rank(c), -c.width if fitting else c.width))
+    top = max(c.density or 1.0 for c in cands)
+    return min((c for c in cands if (c.density or 1.0) == top), key=rank)
+
+# ------------------------------ Parser Backends ------------------------------
+# Every backend yields (element, picture key) in document order. Elements only need
+# `.name` and `.get(attr)`; the picture key identifies an enclosing <picture>.
+
+PARSER_BACKENDS = ("html.parser", "lxml", "html5lib", "selectolax")
+STRAIN_TAGS = frozenset({"img", "source", "meta", "picture", "script", "a", "link", "figure", "figcaption"})
+
+def _strain_keep(name: str, attrs=None) -> bool:
+    return name in STRAIN_TAGS or bool(attrs and "style" in attrs)
+
+class MediaStrainer(SoupStrainer):
+    """Only materialize elements the extraction rules look at."""
+
+    def __init__(self):
+        # bs4 < 4.13 calls a two-argument name function with (name, attrs)
+        super().__init__(name=_strain_keep)
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        # bs4 >= 4.13 decides tag creation here and passes name functions the name only
+        return _strain_keep(name, attrs)
+
+class LexborElement:
+    __slots__ = ("name", "attrs", "node")
+
+    def __init__(self, node):
+        self.name = node.tag
+        self.attrs = node.attributes
+        self.node = node
+
+    @property
+    def string(self) -> str:
+        # Mirrors bs4's Tag.string for the script/caption elements we read text from
+        return self.node.text(deep=True)
+
+    def get(self, key: str, default=None):
+        v = self.attrs.get(key, default)
+        return default if v is None else v
+
+def attr_text(el, name: str) -> str:
+    # bs4 splits multi-valued attributes (class, rel) into lists; lexbor keeps the raw string
+    v = el.get(name)
+    return " ".join(v) if isinstance(v, list) else (v or "")
+
+def clean_text(text: Optional[str]) -> Optional[str]:
+    text = " ".join((text or "").split())
+    return text or None
+
+def figure_caption(el) -> Optional[str]:
+    """Text of the <figcaption> in the <figure> enclosing `el`, if any."""
+    if isinstance(el, LexborElement):
+        node = el.node.parent
+        while node is not None and node.tag != "figure":
+            node = node.parent
+        cap = node.css_first("figcaption") if node is not None else None
+        return clean_text(cap.text(deep=True, separator=" ")) if cap is not None else None
+    fig = el.find_parent("figure")
+    cap = fig.find("figcaption") if fig is not None else None
+    return clean_text(cap.get_text(" ")) if cap is not None else None
+
+def parser_available(backend: str) -> bool:
+    module = {"lxml": "lxml", "html5lib": "html5lib", "selectolax": "selectolax"}.get(backend)
+    if module is None:
+        return backend == "html.parser"
+    try:
+        import importlib
+        importlib.import_module(module)
+        return True
+    except Exception:
+        return False
+
+def iter_elements(html: str, backend: str = "html.parser", strained: bool = False) -> Iterator[Tuple[object, Optional[int]]]:
+    if backend == "selectolax":
+        try:
+            from selectolax.lexbor import LexborHTMLParser as Parser
+        except ImportError:
+            from selectolax.parser import HTMLParser as Parser
+        tree = Parser(html)
+        if strained:
+            nodes = tree.css("img, source, meta, picture, script, a, link, [style]")
+        else:
+            nodes = tree.root.traverse() if tree.root is not None else ()
+        for node in nodes:
+            parent = node.parent
+            yield LexborElement(node), (parent.mem_id if parent is not None and parent.tag == "picture" else None)
+        return
+
+    # html5lib builds the whole tree regardless of parse_only
+    strainer = MediaStrainer() if strained and backend != "html5lib" else None
+    soup = BeautifulSoup(html, backend, parse_only=strainer)
+    for el in soup.descendants:
+        if el.name is None:
+            continue  # text node
+        parent = el.parent
+        # libxml2 doesn't treat <source> as void, so under lxml the <img> nests inside it
+        while parent is not None and parent.name == "source":
+            parent = parent.parent
+        yield el, (id(parent) if parent is not None and parent.name == "picture" else None)
+
+@dataclass
+class ExtractContext:
+    """Per-page state threaded through the extraction rules."""
+    urls: Dict[str, None] = field(default_factory=dict)  # insertion-ordered set
+    pictures: Dict[int, List[SrcCandidate]] = field(default_factory=dict)  # pending <source>s by <picture>
+    picture: Optional[int] = None  # key of the <picture> enclosing the current element
+    meta: Dict[str, Dict[str, str]] = field(default_factory=dict)  # url -> harvested text (item name, …)
+    fresh: List[str] = field(default_factory=list)  # urls added since the walker last drained
+    pages: Dict[str, None] = field(default_factory=dict)  # raw hrefs of further gallery pages
+
+    def add(self, urls: Iterable[str], **meta: Optional[str]) -> None:
+        for u in urls:
+            if u not in self.urls:
+                self.urls[u] = None
+                self.fresh.append(u)
+            for k, v in meta.items():
+                if v:
+                    self.meta.setdefault(u, {}).setdefault(k, v)
+
+    def drain(self) -> List[str]:
+        fresh, self.fresh = self.fresh, []
+        return fresh
+
+def gallery_links(page_url: str, hrefs: Iterable[str]) -> List[str]:
+    """Absolute, fragment-free links that stay inside the gallery at page_url and
+    are not page_url itself: same host, and either the same path (query-paginated
+    galleries like Yelp's ?start=N, where a sibling path is another business) or,
+    for path-paginated slides, the same directory or below it."""
+    base = urlparse(page_url)
+    prefix = base.path.rsplit("/", 1)[0]
+    out = []
+    for href in hrefs:
+        u = urljoin(page_url, href).split("#", 1)[0]
+        p = urlparse(u)
+        if p.netloc != base.netloc or u == page_url:
+            continue
+        if p.query:
+            inside = p.path.rstrip("/") == base.path.rstrip("/")
+        else:
+            inside = p.path.startswith(prefix + "/")
+        if inside:
+            out.append(u)
+    return uniq(out)
+
+# ------------------------------ Embedded JSON State ------------------------------
+
+def iter_json_blobs(script: str, is_json: bool) -> Iterator[object]:
+    """Decode JSON from a <script>: the whole body for JSON-typed scripts, otherwise
+    each `window.__STATE__ = {...}` assignment. raw_decode parses from the offset and
+    stops at the end of the value, so the rest of the script is never scanned."""
+    decoder = json.JSONDecoder()
+    if is_json:
+        start = script.find("{") if script.lstrip()[:1] != "[" else script.find("[")
+        if start >= 0:
+            try:
+                yield decoder.raw_decode(script, start)[0]
+            except ValueError:
+                pass
+        return
+    for m in STATE_ASSIGN_RE.finditer(script):
+        pos = m.end()
+        try:
+            if script.startswith("JSON.parse(", pos):
+                # window.__X__ = JSON.parse("{\"...\"}")
+                literal = decoder.raw_decode(script, pos + len("JSON.parse("))[0]
+                yield json.loads(literal)
+            else:
+                yield decoder.raw_decode(script, pos)[0]
+        except (ValueError, TypeError):
+            continue
+
+def _json_image_url(key: str, value: str) -> bool:
+    if not value.startswith(("http://", "https://", "//")):
+        return False
+    k = key.lower()
+    if any(h in k for h in JSON_IMAGE_KEY_HINTS):
+        return True
+    return Path(urlparse(value).path).suffix.lower() in IMG_EXT_WHITELIST
+
+def iter_json_images(obj: object) -> Iterator[Tuple[str, Optional[str]]]:
+    """Yield (image url, nearest enclosing item name) from a decoded JSON document."""
+    stack: List[Tuple[object, str, Optional[str]]] = [(obj, "", None)]
+    while stack:
+        node, key, name = stack.pop()
+        if isinstance(node, dict):
+            own = next((node[k] for k in JSON_NAME_KEYS if isinstance(node.get(k), str) and node[k].strip()), None)
+            name = own.strip() if own else name
+            for k, v in node.items():
+                if isinstance(v, str):
+                    if _json_image_url(k, v):
+                        yield v, name
+                elif isinstance(v, (dict, list)):
+                    stack.append((v, k, name))
+        elif isinstance(node, list):
+            for v in node:
+                if isinstance(v, str):
+                    if _json_image_url(key, v):
+                        yield v, name
+                elif isinstance(v, (dict, list)):
+                    stack.append((v, key, name))
+
+# ------------------------------ CDN Canonicalization ------------------------------
+# Each canonicalizer maps an image URL to (asset id, variant, preferred URL): the asset id
+# is stable across size/format variants, the preferred URL is the variant we want to fetch.
+
+Canonical = Tuple[str, str, str]
+
+YELP_PHOTO_RE = re.compile(r"^/bphoto/([^/]+)/([^/.]+)\.(\w+)$")
+YELP_WIDTHS = (60, 90, 120, 180, 258, 300, 348, 1000)
+CLOUDINARY_RE = re.compile(r"^(/(?:[^/]+/)?image/upload/)(.*?)([^/]+?)(\.\w+)?$")
+# One comma-separated transformation component: w_200, q_auto:best, d_default.png, $var_3...
+CLOUDINARY_TRANSFORM_RE = re.compile(r"(?:[a-z]{1,3}|\$\w+)_[^/,]+")
+CDN_CGI_RE = re.compile(r"^/cdn-cgi/image/([^/]+)/(.+)$")
+FORMAT_TO_CLOUDINARY = {"jpeg": "jpg", "webp": "webp", "png": "png", "avif": "avif"}
+
+def canonicalize_yelp(url: str, max_width: int, fmt: str) -> Optional[Canonical]:
+    # /bphoto/<id>/<size>.jpg where size is o (original), ls, or <N>s
+    p = urlparse(url)
+    m = YELP_PHOTO_RE.match(p.path)
+    if not m:
+        return None
+    photo_id, variant, ext = m.groups()
+    fitting = [w for w in YELP_WIDTHS if w <= max_width]
+    size = "o" if max_width > YELP_WIDTHS[-1] or not fitting else f"{fitting[-1]}s"
+    return f"yelp:{photo_id}", variant, p._replace(path=f"/bphoto/{photo_id}/{size}.{ext}", query="").geturl()
+
+def canonicalize_cloudinary(url: str, max_width: int, fmt: str) -> Optional[Canonical]:
+    # Grubhub: /<cloud>/image/upload/<transform,...>/[v<N>/]<folders/.../public id>
+    p = urlparse(url)
+    m = CLOUDINARY_RE.match(p.path)
+    if not m:
+        return None
+    prefix, rest, name, ext = m.groups()
+    # Transformations come first; the version or the first other segment starts the public ID
+    segs = [seg for seg in rest.split("/") if seg]
+    n = 0
+    while n < len(segs) and all(CLOUDINARY_TRANSFORM_RE.fullmatch(t) for t in segs[n].split(",")):
+        n += 1
+    transforms, public = segs[:n], segs[n:]
+    version = public[:1] if public and re.fullmatch(r"v\d+", public[0]) else []
+    public_id = "/".join([*public[len(version):], name])
+    want = f"c_limit,w_{max_width},q_auto:best,f_{FORMAT_TO_CLOUDINARY.get(fmt, 'jpg')}"
+    path = prefix + "/".join([want, *version, public_id])
+    return f"cloudinary:{p.hostname}:{public_id}", "/".join(transforms), p._replace(path=path, query="").geturl()
+
+def canonicalize_cdn_cgi(url: str, max_width: int, fmt: str) -> Optional[Canonical]:
+    # DoorDash (Cloudflare image resizing): /cdn-cgi/image/<options>/<origin url or path>
+    p = urlparse(url)
+    m = CDN_CGI_RE.match(p.path)
+    if not m:
+        return None
+    options, origin = m.groups()
+    want = f"fit=scale-down,width={max_width},format={fmt if fmt in ('jpeg', 'webp', 'avif') else 'jpeg'},quality=90"
+    return f"cdn-cgi:{origin}", options, p._replace(path=f"/cdn-cgi/image/{want}/{origin}").geturl()
+
+def canonicalize_gannett(url: str, max_width: int, fmt: str) -> Optional[Canonical]:
+    # NorthJersey/Gannett: size, crop and format live in the query string
+    p = urlparse(url)
+    if not p.query:
+        return None
+    query = dict(parse_qsl(p.query))
+    variant = urlencode(sorted(query.items()))
+    for k in ("width", "height", "crop", "fit", "auto", "format", "quality"):
+        query.pop(k, None)
+    query["width"] = str(max_width)
+    query["format"] = {"jpeg": "pjpg", "png": "png"}.get(fmt, "pjpg")
+    if fmt == "webp":
+        query["auto"] = "webp"
+    return f"gannett:{p.path}", variant, p._replace(query=urlencode(query)).geturl()
+
+# fnmatch host pattern -> canonicalizer; first match wins, unmatched hosts keep their URL
+CANONICALIZERS: Dict[str, Callable[[str, int, str], Optional[Canonical]]] = {
+    "*.yelpcdn.com": canonicalize_yelp,
+    "res.cloudinary.com": canonicalize_cloudinary,
+    "media-cdn.grubhub.com": canonicalize_cloudinary,
+    "*.cdn4dd.com": canonicalize_cdn_cgi,
+    "*.gannett-cdn.com": canonicalize_gannett,
+}
+
+def canonicalize_url(url: str, max_width: int, fmt: str) -> Canonical:
+    host = host_of(url)
+    for pattern, func in CANONICALIZERS.items():
+        if fnmatch.fnmatch(host, pattern):
+            try:
+                result = func(url, max_width, fmt)
+            except Exception:
+                result = None
+            if result:
+                return result
+            break
+    return url, "", url
+
+# ------------------------------ Image Sniffing ------------------------------
+
+SNIFF_BYTES = 64  # enough for every signature below and the PNG/GIF/WEBP size fields
+PROBE_BYTES = 64 * 1024  # head cap, both engines: JPEG SOF / AVIF ispe / SVG prolog must fit (one read chunk)
+JPEG_SOF_MARKERS = frozenset({0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF})
+ISOBMFF_BRANDS = {b"avif": ".avif", b"avis": ".avif", b"heic": ".heic", b"heix": ".heic",
+                  b"mif1": ".heif", b"msf1": ".heif", b"jp2 ": ".jp2"}
+
+class RejectedBody(Exception):
+    """A response that turned out not to be worth keeping (not an image, too small, too big).
+    `facts` ({"bytes": n} or {"width": w, "height": h}) is what a rerun needs to judge the
+    URL again without fetching it; None marks a rejection that may be transient."""
+
+    def __init__(self, reason: str, facts: Optional[Dict[str, int]] = None):
+        super().__init__(reason)
+        self.facts = facts
+
+def sniff_image(head: bytes) -> Optional[str]:
+    """File extension for the image format named by the body's magic bytes,
+    or None when the payload is not an image (HTML error page, JSON, video…)."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if head[4:8] == b"ftyp":
+        return ISOBMFF_BRANDS.get(head[8:12])
+    if head.startswith(b"\x00\x00\x00\x0cjP  ") or head.startswith(b"\xff\x4f\xff\x51"):
+        return ".jp2"
+    if head.startswith(b"\xff\x0a") or head.startswith(b"\x00\x00\x00\x0cJXL "):
+        return ".jxl"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return ".tiff"
+    if head.startswith(b"BM"):
+        return ".bmp"
+    if head.startswith(b"\x00\x00\x01\x00"):
+        return ".ico"
+    rest = _skip_xml_prolog(head)
+    if rest is not None and rest.startswith(b"<svg"):
+        return ".svg"
+    return None
+
+def _skip_xml_prolog(head: bytes) -> Optional[bytes]:
+    # Lowercased text after any XML declaration, processing instructions, comments and
+    # doctype (internal subset included); None while one of those runs past `head`
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    while text.startswith((b"<?", b"<!--", b"<!doctype")):
+        if text.startswith(b"<!doctype"):
+            bracket, close = text.find(b"["), text.find(b">")
+            end = text.find(b"]", bracket) if 0 <= bracket < close else close
+            end = text.find(b">", end) if end >= 0 else -1
+            n = 1
+        else:
+            end, n = (text.find(b"?>"), 2) if text.startswith(b"<?") else (text.find(b"-->", 4), 3)
+        if end < 0:
+            return None
+        text = text[end + n:].lstrip(b" \t\r\n")
+    return text
+
+def _jpeg_dims(head: bytes) -> Optional[Tuple[int, int]]:
+    # Walk the marker segments up to the first start-of-frame
+    i = 2
+    while i + 4 <= len(head):
+        if head[i] != 0xFF:
+            return None
+        marker = head[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # standalone markers
+            i += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            if i + 9 > len(head):
+                return None
+            return int.from_bytes(head[i + 7:i + 9], "big"), int.from_bytes(head[i + 5:i + 7], "big")
+        i += 2 + int.from_bytes(head[i + 2:i + 4], "big")
+    return None
+
+def _webp_dims(head: bytes) -> Optional[Tuple[int, int]]:
+    chunk = head[12:16]
+    if chunk == b"VP8 " and len(head) >= 30 and head[23:26] == b"\x9d\x01\x2a":
+        return (int.from_bytes(head[26:28], "little") & 0x3FFF, int.from_bytes(head[28:30], "little") & 0x3FFF)
+    if chunk == b"VP8L" and len(head) >= 25 and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(head) >= 30:
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+def _ispe_dims(head: bytes) -> Optional[Tuple[int, int]]:
+    # AVIF/HEIF: every image item has an `ispe` property (thumbnails and alpha planes
+    # too), so take the largest as the primary image
+    best = None
+    i = head.find(b"ispe")
+    while i >= 4 and i + 16 <= len(head):
+        dims = int.from_bytes(head[i + 8:i + 12], "big"), int.from_bytes(head[i + 12:i + 16], "big")
+        if best is None or dims[0] * dims[1] > best[0] * best[1]:
+            best = dims
+        i = head.find(b"ispe", i + 4)
+    return best
+
+def header_dims(head: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) parsed from the first bytes of a body, or None if the format
+    doesn't say (SVG…) or the size field lies beyond `head`."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR" and len(head) >= 24:
+        return int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+    if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+        return int.from_bytes(head[6:8], "little"), int.from_bytes(head[8:10], "little")
+    if head.startswith(b"\xff\xd8"):
+        return _jpeg_dims(head)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return _webp_dims(head)
+    if head[4:8] == b"ftyp":
+        return _ispe_dims(head)
+    if head.startswith(b"BM") and len(head) >= 26:
+        return int.from_bytes(head[18:22], "little", signed=True), abs(int.from_bytes(head[22:26], "little", signed=True))
+    return None
+
+def head_settled(head: bytes) -> bool:
+    # Enough bytes read to judge the body: format known and either its size found
+    # or a format that won't state one
+    if len(head) < SNIFF_BYTES:
+        return False
+    ext = sniff_image(head)
+    if ext is None and _skip_xml_prolog(head) in (None, b""):
+        return False  # could still be an SVG behind a long prolog
+    return ext is None or ext in (".svg", ".ico", ".tiff", ".jxl", ".jp2") or header_dims(head) is not None
+
+def head_wanted(head: bytes) -> int:
+    """How many more bytes to read before screening a body: 0 once the head is
+    settled or PROBE_BYTES are in hand. The one head policy for both engines."""
+    return 0 if head_settled(head) else max(0, PROBE_BYTES - len(head))
+
+def take_head(chunks: Iterator[bytes]) -> bytes:
+    """Pull chunks until `head_wanted` is satisfied; the rest of the body stays in the iterator."""
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if not head_wanted(head):
+            break
+    return head
+
+# ------------------------------ Download Index ------------------------------
+
+def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since from an index entry's validators."""
+    headers: Dict[str, str] = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-\d+/(\d+|\*)", re.I)
+
+def content_range(headers) -> Optional[Tuple[int, Optional[int]]]:
+    """(first byte, total size or None) from a 206 response's Content-Range."""
+    m = CONTENT_RANGE_RE.match(headers.get("Content-Range") or "")
+    if not m:
+        return None
+    return int(m.group(1)), (None if m.group(2) == "*" else int(m.group(2)))
+
+def if_range_validator(headers) -> Optional[str]:
+    # If-Range only accepts a strong ETag or a date
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+INDEX_FILENAME = ".download-index.jsonl"
+MANIFEST_FILENAME = "manifest.json"
+PAGE_CACHE_DIR = Path(".cache") / "pages"
+GALLERY_FETCH_WORKERS = 4  # follow-up gallery pages fetched at once (per-host limiter still applies)
+
+class DownloadIndex:
+    """Append-only JSONL manifest of fetched URLs, stored in the images dir.
+
+    Each line is a full record {url, path, size, sha256, etag, last_modified,
+    fetched_at}; on load the last record per URL wins. `close()` rewrites the
+    file with one line per URL so it does not grow without bound.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from a killed run
+                    if isinstance(rec, dict) and rec.get("url"):
+                        self._entries[rec["url"]] = rec
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            return self._entries.get(url)
+
+    def entries(self) -> List[Dict]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def put(self, url: str, **fields) -> Dict:
+        rec = {"url": url, **fields, "fetched_at": int(time.time())}
+        line = json.dumps(rec, separators=(",", ":"))
+        with self._lock:
+            self._entries[url] = rec
+            self._fh.write(line + "\n")
+            self._fh.flush()
+        return rec
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for rec in self._entries.values():
+                    f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+            os.replace(tmp, self.path)
+
+# ------------------------------ Blob Store ------------------------------
+
+BLOB_DIR = ".blobs"
+
+class BlobStore:
+    """Content-addressed store: every unique image body lives once under
+    .blobs/<aa>/<sha256><ext>; per-source folders get hardlinks to it."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._tmp_dir = self.root / "tmp"
+        ensure_dir(self._tmp_dir)
+        self._lock = threading.Lock()
+
+    def temp_path(self) -> Path:
+        fd, name = tempfile.mkstemp(dir=self._tmp_dir, suffix=".part")
+        os.close(fd)
+        return Path(name)
+
+    def part_path(self, url: str, folder: Path) -> Path:
+        # Stable per-(folder, URL) name so an interrupted body is found again on the next
+        # run, and two folders fetching the same URL never stream into one file
+        return self._tmp_dir / (sha1_name(f"{Path(folder).name}\n{url}") + ".part")
+
+    def find(self, digest: str) -> Optional[Path]:
+        return next((self.root / digest[:2]).glob(digest + ".*"), None)
+
+    def commit(self, tmp: Path, digest: str, ext: str) -> Tuple[Path, bool]:
+        """Move a finished temp file into the store; returns (blob, created)."""
+        with self._lock:
+            existing = self.find(digest)
+            if existing is not None:
+                tmp.unlink(missing_ok=True)
+                return existing, False
+            blob = self.root / digest[:2] / (digest + ext)
+            ensure_dir(blob.parent)
+            os.chmod(tmp, 0o644)  # mkstemp creates 0600
+            os.replace(tmp, blob)
+            return blob, True
+
+    def link(self, blob: Path, dest: Path) -> None:
+        if dest.exists() or dest.is_symlink():
+            dest.unlink()
+        try:
+            os.link(blob, dest)
+        except OSError:
+            # Filesystems without hardlinks (or a cross-device images dir) get a copy
+            shutil.copy2(blob, dest)
+
+RESUME_MIN_BYTES = 256 * 1024  # smaller bodies just restart; not worth an index write
+
+class PartFile:
+    """Sink for one image body in its .part file, appending on resume. The hash
+    covers the bytes already on disk, so the blob address stays exact."""
+
+    def __init__(self, path: Path, offset: int = 0, keep_on_abort: bool = False, limit: Optional[int] = None):
+        self.path = path
+        self.size = offset
+        self.keep_on_abort = keep_on_abort
+        self.limit = limit
+        # What sniffing the head found: extension to save under and (width, height)
+        self.ext = ".jpg"
+        self.dims: Optional[Tuple[int, int]] = None
+        self._hash = hashlib.sha256()
+        if offset:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    self._hash.update(block)
+        self._f = open(path, "ab" if offset else "wb")
+
+    def write(self, chunk: bytes) -> None:
+        if chunk:
+            self._f.write(chunk)
+            self._hash.update(chunk)
+            self.size += len(chunk)
+            if self.limit is not None and self.size > self.limit:
+                self.keep_on_abort = False
+                raise RejectedBody(f"body exceeds {self.limit} bytes", {"bytes": self.size})
+
+    def finish(self, expected: Optional[int] = None) -> str:
+        self._f.close()
+        if expected is not None and self.size != expected:
+            raise IOError(f"truncated body ({self.size} of {expected} bytes)")
+        return self._hash.hexdigest()
+
+    def abort(self) -> None:
+        self._f.close()
+        if not self.keep_on_abort:
+            self.path.unlink(missing_ok=True)
+
+# ------------------------------ Near-duplicate Detection ------------------------------
+
+LOSSLESS_EXT = {".png", ".gif", ".bmp", ".tif", ".tiff"}
+
+def dhash_file(path: Path) -> Optional[Tuple[int, int, int]]:
+    """64-bit difference hash plus (width, height); None if Pillow can't decode it."""
+    try:
+        from PIL import Image
+    except Exception:
+        return None
+    try:
+        with Image.open(path) as im:
+            width, height = im.size
+            im.draft("L", (64, 64))  # let JPEG decode at reduced scale
+            px = list(im.convert("L").resize((9, 8)).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits, width, height
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes for radius queries in Hamming space."""
+
+    def __init__(self):
+        self._root: Optional[list] = None  # node: [hash, value, {distance: child}]
+
+    def add(self, h: int, value) -> None:
+        if self._root is None:
+            self._root = [h, value, {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(h, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, value, {}]
+                return
+            node = child
+
+    def find(self, h: int, radius: int) -> List[Tuple[int, object]]:
+        out: List[Tuple[int, object]] = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius:
+                out.append((d, node[1]))
+            # Triangle inequality: only children within [d - r, d + r] can match
+            for dist, child in node[2].items():
+                if d - radius <= dist <= d + radius:
+                    stack.append(child)
+        return out
+
+# ------------------------------ Responsive Variants ------------------------------
+
+VARIANT_WIDTHS = (320, 640, 960, 1280, 1920)
+VARIANT_FORMATS = ("avif", "webp", "jpeg")
+VARIANT_QUALITY = {"avif": 55, "webp": 80, "jpeg": 82}
+VARIANT_EXT = {"avif": ".avif", "webp": ".webp", "jpeg": ".jpg"}
+VARIANT_DIR = "optimized"
+VARIANT_CACHE = ".variants.json"
+
+def _load_avif_plugin() -> None:
+    # Pillow < 11.3 only writes AVIF with the pillow-avif-plugin package registered
+    try:
+        import pillow_avif  # noqa: F401
+    except Exception:
+        pass
+
+def encodable_formats(formats: Iterable[str]) -> List[str]:
+    """The subset of `formats` this Pillow build can write."""
+    try:
+        from PIL import Image
+    except Exception:
+        return []
+    _load_avif_plugin()
+    Image.init()
+    return [f for f in formats if f in VARIANT_EXT and f.upper() in Image.SAVE]
+
+def render_variants(src: str, digest: str, out_dir: str, widths: Tuple[int, ...], formats: Tuple[str, ...]) -> List[Dict]:
+    """Decode one image and write its width ladder in every format as
+    <digest[:16]>-<width>w.<ext>, without EXIF/ICC/XMP. Runs in a worker process,
+    so it takes and returns plain data."""
+    from PIL import Image, ImageOps
+    _load_avif_plugin()
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im)  # bake the orientation in before EXIF is dropped
+        alpha = im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info)
+        base = im.convert("RGBA" if alpha else "RGB")
+    base.info = {}
+
+    out: List[Dict] = []
+    # Never upscale: the ladder stops at the source width
+    ladder = sorted({w for w in widths if w <= base.width} or {base.width}, reverse=True)
+    for width in ladder:
+        height = max(1, round(base.height * width / base.width))
+        frame = base if width == base.width else base.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            img = frame
+            if fmt == "jpeg" and img.mode == "RGBA":
+                img = Image.new("RGB", frame.size, (255, 255, 255))
+                img.paste(frame, mask=frame.getchannel("A"))
+            name = f"{digest[:16]}-{width}w{VARIANT_EXT[fmt]}"
+            dest = Path(out_dir) / name
+            tmp = dest.with_name(name + ".tmp")
+            opts = {"optimize": True, "progressive": True} if fmt == "jpeg" else {}
+            img.save(tmp, fmt.upper(), quality=VARIANT_QUALITY[fmt], **opts)
+            os.replace(tmp, dest)
+            out.append({"path": name, "width": width, "height": height, "format": fmt, "bytes": dest.stat().st_size})
+    return out
+
+# ------------------------------ Placeholders ------------------------------
+
+PLACEHOLDERS_FILENAME = "placeholders.json"
+BLURHASH_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+BLURHASH_SAMPLE = 32  # longest side of the pixels the hash is computed from
+LQIP_WIDTH = 16
+
+def _base83(value: int, length: int) -> str:
+    return "".join(BLURHASH_CHARS[value // 83 ** (length - 1 - i) % 83] for i in range(length))
+
+def blurhash_encode(rgb, cx: int = 4, cy: int = 3) -> str:
+    """BlurHash of an (h, w, 3) uint8 array. Every basis sum is one einsum over the
+    linearized pixels instead of a Python loop per component."""
+    import numpy as np
+
+    h, w = rgb.shape[:2]
+    v = rgb[..., :3].astype(np.float64) / 255.0
+    lin = np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+    basis_x = np.cos(np.pi * np.arange(cx)[:, None] * np.arange(w)[None, :] / w)  # (cx, w)
+    basis_y = np.cos(np.pi * np.arange(cy)[:, None] * np.arange(h)[None, :] / h)  # (cy, h)
+    factors = np.einsum("jy,ix,yxc->jic", basis_y, basis_x, lin) * (2.0 / (w * h))
+    factors[0, 0] /= 2  # the DC term is normalized by 1, every AC term by 2
+    factors = factors.reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    out = _base83((cx - 1) + (cy - 1) * 9, 1)
+    if len(ac):
+        qmax = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        max_ac = (qmax + 1) / 166
+    else:
+        qmax, max_ac = 0, 1.0
+    out += _base83(qmax, 1)
+
+    dc = np.clip(dc, 0, 1)
+    srgb = np.trunc(np.where(dc <= 0.0031308, dc * 12.92, 1.055 * dc ** (1 / 2.4) - 0.055) * 255 + 0.5).astype(int)
+    out += _base83((int(srgb[0]) << 16) + (int(srgb[1]) << 8) + int(srgb[2]), 4)
+
+    scaled = ac / max_ac
+    quant = np.clip(np.floor(np.sign(scaled) * np.sqrt(np.abs(scaled)) * 9 + 9.5), 0, 18).astype(int)
+    for r, g, b in quant:
+        out += _base83(int(r) * 361 + int(g) * 19 + int(b), 2)
+    return out
+
+def placeholder_for(path: Path) -> Optional[Dict[str, str]]:
+    """BlurHash, a base64 WEBP LQIP and the average color of one image; None if
+    Pillow/NumPy are missing or the file can't be decoded."""
+    try:
+        import numpy as np
+        from PIL import Image, ImageOps
+    except Exception:
+        return None
+    try:
+        with Image.open(path) as im:
+            im.draft("RGB", (BLURHASH_SAMPLE * 2, BLURHASH_SAMPLE * 2))  # JPEG: decode at 1/2..1/8 scale
+            small = ImageOps.exif_transpose(im).convert("RGB")
+        small.thumbnail((BLURHASH_SAMPLE, BLURHASH_SAMPLE), Image.BILINEAR)
+        rgb = np.asarray(small)
+        cx, cy = (4, 3) if small.width >= small.height else (3, 4)
+        tiny = small.resize((LQIP_WIDTH, max(1, round(LQIP_WIDTH * small.height / small.width))), Image.BILINEAR)
+        buf = io.BytesIO()
+        tiny.save(buf, "WEBP", quality=40)
+    except Exception:
+        return None
+    r, g, b = (int(c) for c in rgb.reshape(-1, 3).mean(axis=0))
+    return {
+        "blurhash": blurhash_encode(rgb, cx, cy),
+        "lqip": "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii"),
+        "color": f"#{r:02x}{g:02x}{b:02x}",
+    }
+
+# ------------------------------ Menu Matching ------------------------------
+
+MENU_PATCH_FILENAME = "menu-image.patch.json"
+# How much a hit in each harvested text field is worth
+MATCH_FIELD_WEIGHTS = {"name": 1.0, "caption": 0.95, "alt": 0.9, "title": 0.8}
+
+def match_tokens(text: str) -> List[str]:
+    # Accent- and apostrophe-folded words with a crude plural strip ("Reese’s" -> "reese")
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    words = re.findall(r"[a-z0-9]+", text.replace("'", ""))
+    return [w[:-1] if len(w) > 3 and w.endswith("s") else w for w in words]
+
+def trigrams(tokens: List[str]) -> Set[str]:
+    text = f" {' '.join(tokens)} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class MenuMatcher:
+    """Inverted token and trigram index over menu item names. A text is scored
+    against only the items it shares postings with, in one pass over its grams."""
+
+    def __init__(self, names: List[str]):
+        self.names = names
+        self._tokens: List[Set[str]] = []
+        self._grams: List[Set[str]] = []
+        self._token_index: Dict[str, Set[int]] = {}
+        self._gram_index: Dict[str, Set[int]] = {}
+        for i, name in enumerate(names):
+            toks = set(match_tokens(name))
+            grams = trigrams(match_tokens(name))
+            self._tokens.append(toks)
+            self._grams.append(grams)
+            for t in toks:
+                self._token_index.setdefault(t, set()).add(i)
+            for g in grams:
+                self._gram_index.setdefault(g, set()).add(i)
+
+    def match(self, text: str) -> List[Tuple[float, int]]:
+        """(score in 0..1, item index) for every item the text overlaps, best first.
+        The score mostly rewards covering the item's name (tokens, then trigrams
+        for typos and word splits), with a little for the text being mostly that name."""
+        toks = match_tokens(text)
+        tok_set = set(toks)
+        token_hits: Dict[int, int] = {}
+        for t in tok_set:
+            for i in self._token_index.get(t, ()):
+                token_hits[i] = token_hits.get(i, 0) + 1
+        gram_hits: Dict[int, int] = {}
+        for g in trigrams(toks):
+            for i in self._gram_index.get(g, ()):
+                gram_hits[i] = gram_hits.get(i, 0) + 1
+        scored = []
+        for i, grams in gram_hits.items():
+            hits = token_hits.get(i, 0)
+            coverage = hits / len(self._tokens[i]) if self._tokens[i] else 0.0
+            precision = hits / len(tok_set) if tok_set else 0.0
+            scored.append((0.55 * coverage + 0.35 * grams / len(self._grams[i]) + 0.10 * precision, i))
+        scored.sort(reverse=True)
+        return scored
+
+# ------------------------------ Browser Pool ------------------------------
+
+# Collect every attribute the extraction rules care about in one round trip
+PW_COLLECT_JS = """(attrs) => ({
+  imgs: Array.from(document.querySelectorAll("img"), el => ({
+    plain: attrs.map(a => el.getAttribute(a)).filter(Boolean),
+    srcset: el.getAttribute("srcset") || el.getAttribute("data-srcset"),
+  })),
+  sources: Array.from(document.querySelectorAll("source"), el => ({
+    srcset: el.getAttribute("srcset"), type: el.getAttribute("type"), src: el.getAttribute("src"),
+  })),
+  styles: Array.from(document.querySelectorAll("[style*=background-image]"), el => el.getAttribute("style")),
+  metas: Array.from(document.querySelectorAll("meta[property='og:image'], meta[name='twitter:image']"),
+                    el => el.getAttribute("content")).filter(Boolean),
+})"""
+
+# Playwright resource types that never contribute image URLs
+BLOCKED_RESOURCE_TYPES = frozenset({"font", "stylesheet", "media", "websocket", "manifest", "texttrack", "eventsource"})
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.com", "hotjar.com", "segment.io", "segment.com", "optimizely.com",
+    "newrelic.com", "nr-data.net", "sentry.io", "amplitude.com", "branch.io", "quantserve.com",
+    "scorecardresearch.com", "criteo.com", "criteo.net", "taboola.com", "outbrain.com", "adsrvr.org",
+    "amazon-adsystem.com", "chartbeat.com", "chartbeat.net", "tiqcdn.com", "bing.com", "clarity.ms",
+)
+
+def playwright_validators(headers: Dict[str, str]) -> Dict[str, Optional[str]]:
+    # Playwright lowercases header names; the index reads the canonical spelling
+    return {"ETag": headers.get("etag"), "Last-Modified": headers.get("last-modified")}
+
+def is_tracker_host(host: str) -> bool:
+    return any(host == t or host.endswith("." + t) for t in TRACKER_HOSTS)
+
+class NetTracker:
+    """Counts a page's in-flight requests so scrolling can stop once the network is quiet."""
+
+    def __init__(self, page):
+        self.inflight = 0
+        self.last_activity = time.monotonic()
+        page.on("request", self._started)
+        page.on("requestfinished", self._ended)
+        page.on("requestfailed", self._ended)
+
+    def _started(self, _request) -> None:
+        self.inflight += 1
+        self.last_activity = time.monotonic()
+
+    def _ended(self, _request) -> None:
+        self.inflight = max(0, self.inflight - 1)
+        self.last_activity = time.monotonic()
+
+    def quiet_for(self) -> float:
+        return 0.0 if self.inflight else time.monotonic() - self.last_activity
+
+# Scroll one viewport; report (image count, document height, reached bottom)
+PW_SCROLL_JS = """() => {
+  const el = document.scrollingElement || document.documentElement;
+  window.scrollBy(0, window.innerHeight);
+  return [document.images.length, el.scrollHeight, window.scrollY + window.innerHeight >= el.scrollHeight - 2];
+}"""
+
+async def scroll_until_settled(page, tracker: NetTracker, max_seconds: float = 15.0,
+                               step_ms: int = 250, quiet_sec: float = 0.5) -> None:
+    """Scroll to trigger lazy loading until the page is at the bottom, the <img> count
+    and height stop changing, and the network has been idle, or max_seconds passes."""
+    deadline = time.monotonic() + max_seconds
+    last = None
+    stable = 0
+    while time.monotonic() < deadline:
+        count, height, at_bottom = await page.evaluate(PW_SCROLL_JS)
+        await page.wait_for_timeout(step_ms)
+        if at_bottom and (count, height) == last and tracker.quiet_for() >= quiet_sec:
+            stable += 1
+            if stable >= 2:
+                return
+        else:
+            stable = 0
+        last = (count, height)
+
+class BrowserPool:
+    """One headless Chromium shared by every worker for the whole run.
+
+    Playwright objects are bound to the event loop that created them, so the pool
+    owns a private loop thread running the async API and callers submit coroutines
+    through run(). There is one browser context per source host, so cookies from
+    rendering a page are reused by later image fetches, and a semaphore caps how
+    many pages are open at once. The browser is launched lazily on first use.
+    """
+
+    def __init__(self, max_pages: int = 2, block_resources: bool = True):
+        self.max_pages = max(1, max_pages)
+        self.block_resources = block_resources
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pw = None
+        self._browser = None
+        self._contexts: Dict[str, object] = {}
+        self._warm: Dict[str, "asyncio.Future"] = {}
+        self._failed: Optional[BaseException] = None
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                if self._failed is not None:
+                    raise RuntimeError(f"browser unavailable: {self._failed}")
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="playwright", daemon=True)
+                thread.start()
+                try:
+                    asyncio.run_coroutine_threadsafe(self._launch(), loop).result(120)
+                except BaseException as e:
+                    # Don't relaunch for every image once Chromium is known to be missing
+                    self._failed = e
+                    loop.call_soon_threadsafe(loop.stop)
+                    thread.join(5)
+                    loop.close()
+                    raise
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    async def _launch(self) -> None:
+        from playwright.async_api import async_playwright
+        self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch(headless=True)
+        self._ctx_lock = asyncio.Lock()
+        self._pages = asyncio.Semaphore(self.max_pages)
+
+    async def _context_for(self, host: str):
+        async with self._ctx_lock:
+            context = self._contexts.get(host)
+            if context is None:
+                context = await self._browser.new_context(
+                    user_agent=DEFAULT_HEADERS["User-Agent"],
+                    viewport={"width": 1600, "height": 1000},
+                )
+                self._contexts[host] = context
+            return context
+
+    async def new_page(self, context) -> Tuple[object, NetTracker]:
+        """Open a page with resource blocking installed and a network tracker attached."""
+        page = await context.new_page()
+        try:
+            tracker = NetTracker(page)
+            if self.block_resources:
+                await page.route("**/*", self._route)
+        except BaseException:
+            await page.close()
+            raise
+        return page, tracker
+
+    async def _route(self, route) -> None:
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or is_tracker_host(host_of(request.url)):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def run(self, host: str, fn: Callable, timeout: float = 300):
+        """Block until `await fn(context)` finishes on the pool loop, using the context for host."""
+        loop = self._start()
+
+        async def job():
+            context = await self._context_for(host)
+            async with self._pages:
+                return await fn(context)
+
+        fut = asyncio.run_coroutine_threadsafe(job(), loop)
+        try:
+            return fut.result(timeout)
+        except BaseException:
+            # Timed out or interrupted: stop the coroutine so it gives its page slot back
+            fut.cancel()
+            raise
+
+    def mark_warm(self, page_url: str) -> None:
+        # Called on the pool loop once a page has been rendered in its host context
+        fut = self._warm.get(page_url)
+        if fut is None:
+            fut = self._warm[page_url] = asyncio.get_running_loop().create_future()
+        if not fut.done():
+            fut.set_result(True)
+
+    async def warm(self, context, page_url: str) -> None:
+        """Visit page_url once per run so its cookies land in the context."""
+        fut = self._warm.get(page_url)
+        if fut is not None:
+            await fut
+            return
+        fut = self._warm[page_url] = asyncio.get_running_loop().create_future()
+        page = None
+        try:
+            page, _ = await self.new_page(context)
+            await page.goto(page_url, timeout=60_000, wait_until="domcontentloaded")
+            await page.wait_for_load_state("load", timeout=10_000)
+        except Exception:
+            pass
+        finally:
+            if page is None:
+                # Never got a page (context or browser gone): let a later call try again
+                self._warm.pop(page_url, None)
+            else:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            # Always release whoever is waiting on this visit
+            if not fut.done():
+                fut.set_result(page is not None)
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None:
+                return
+
+            async def shutdown():
+                for context in self._contexts.values():
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                await self._browser.close()
+                await self._pw.stop()
+
+            try:
+                asyncio.run_coroutine_threadsafe(shutdown(), loop).result(30)
+            except Exception as e:
+                print(f"[warn] Playwright shutdown: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(5)
+            loop.close()
+            self._contexts.clear()
+            self._warm.clear()
+
 # ------------------------------ ImageScraper ------------------------------
 
 @dataclass
@@ -143,6 +1353,106 @@ class ScrapeStats:
     images_found: int = 0
     images_downloaded: int = 0
     images_failed: int = 0
+    images_skipped: int = 0
+    images_not_modified: int = 0
+    images_deduped: int = 0
+    images_near_dupes: int = 0
+    images_rejected: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        # Counters are shared by download workers
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+class _Bucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+class HostRateLimiter:
+    """Token bucket per host, shared by every worker thread and the async engine.
+
+    `default` applies to hosts that match none of the patterns in `host_rates`
+    (fnmatch-style, first match wins). A rate of 0 disables limiting.
+    """
+
+    def __init__(self, default: Tuple[float, float], host_rates: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.default = default
+        self.host_rates = dict(host_rates or {})
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, _Bucket] = {}
+
+    def _limits_for(self, host: str) -> Tuple[float, float]:
+        for pattern, limits in self.host_rates.items():
+            if fnmatch.fnmatch(host, pattern):
+                return limits
+        return self.default
+
+    def _reserve(self, url: str) -> float:
+        host = host_of(url)
+        with self._lock:
+            b = self._buckets.get(host)
+            if b is None:
+                b = self._buckets[host] = _Bucket(*self._limits_for(host))
+            if b.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            b.tokens = min(b.burst, b.tokens + (now - b.stamp) * b.rate)
+            b.stamp = now
+            # Tokens may go negative: that is the queue of callers already waiting
+            b.tokens -= 1.0
+            return 0.0 if b.tokens >= 0 else -b.tokens / b.rate
+
+    def acquire(self, url: str) -> None:
+        wait = self._reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str) -> None:
+        wait = self._reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+# ------------------------------ Download Pipeline ------------------------------
+
+class DownloadQueue:
+    """Bounded hand-off from page extraction to a fixed set of download threads.
+    put() blocks while the downloaders are behind, so a huge gallery never piles
+    up in memory ahead of the network."""
+
+    def __init__(self, handler: Callable[..., None], workers: int, maxsize: int):
+        self._q: "queue.Queue[Optional[Tuple]]" = queue.Queue(maxsize=max(1, maxsize))
+        self._threads = [
+            threading.Thread(target=self._work, args=(handler,), name=f"dl-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def put(self, *job) -> None:
+        self._q.put(job)
+
+    def _work(self, handler: Callable[..., None]) -> None:
+        while True:
+            job = self._q.get()
+            if job is None:
+                return
+            try:
+                handler(*job)
+            except Exception as e:
+                print(f"[error] download worker: {e}")
+
+    def close(self) -> None:
+        # Sentinels queue up behind the remaining jobs, so this drains before returning
+        for _ in self._threads:
+            self._q.put(None)
+        for t in self._threads:
+            t.join()
 
 class ImageScraper:
     def __init__(
@@ -153,23 +1463,100 @@ class ImageScraper:
         delay_sec: float = 0.5,
         timeout: int = 20,
         max_retries: int = 3,
+        workers: int = 1,
+        page_workers: int = 1,
+        queue_size: int = 256,
+        max_pages: int = 1,
+        host_rates: Optional[Dict[str, Tuple[float, float]]] = None,
+        refresh: bool = False,
+        revalidate: bool = False,
+        near_dup_distance: Optional[int] = None,
+        max_width: int = 1600,
+        prefer_formats: Iterable[str] = DEFAULT_FORMAT_PREFERENCE,
+        all_variants: bool = False,
+        parser: str = "html.parser",
+        strained: bool = False,
+        browser_pages: int = 2,
+        pw_capture: bool = False,
+        block_resources: bool = True,
+        min_dim: int = 32,
+        max_bytes: int = 25 * 1024 * 1024,
+        min_width: int = 0,
+        placeholders: bool = False,
+        menu_path: Optional[Path] = None,
+        match_threshold: float = 0.6,
+        public_prefix: str = "/public/images",
+        optimize: bool = False,
+        variant_widths: Iterable[int] = VARIANT_WIDTHS,
+        variant_formats: Iterable[str] = VARIANT_FORMATS,
+        optimize_dir: Optional[Path] = None,
+        optimize_procs: Optional[int] = None,
     ):
         self.readme_path = Path(readme_path)
         self.images_dir = Path(images_dir)
         self.delay_sec = delay_sec
         self.timeout = timeout
+        self.max_retries = max_retries
+        self.workers = max(1, workers)
+        self.page_workers = max(1, page_workers)
+        self.queue_size = queue_size
+        self.max_pages = max(1, max_pages)
+        self.min_dim = min_dim
+        self.max_bytes = max_bytes
+        self.min_width = min_width
+        self.placeholders = placeholders
+        self.menu_path = Path(menu_path) if menu_path else None
+        self.match_threshold = match_threshold
+        self.public_prefix = public_prefix.rstrip("/")
+        self.optimize = optimize
+        self.variant_widths = tuple(sorted(set(variant_widths)))
+        self.variant_formats = tuple(FORMAT_ALIASES.get(f, f) for f in variant_formats)
+        self.optimize_dir = Path(optimize_dir) if optimize_dir else self.images_dir / VARIANT_DIR
+        self.optimize_procs = optimize_procs or os.cpu_count() or 1
+        # blob sha256 -> rendered variants, filled by the optimize stage
+        self.variants: Dict[str, List[Dict]] = {}
+        # Shared by every page thread while run() is active
+        self._downloads: Optional[DownloadQueue] = None
+        # (output folder, asset id) pairs already handed to a downloader this run
+        self._seen: Set[Tuple[str, str]] = set()
+        self._seen_lock = threading.Lock()
+        self.refresh = refresh
+        self.revalidate = revalidate
+        self.near_dup_distance = near_dup_distance
+        self.max_width = max_width
+        self.prefer_formats = tuple(FORMAT_ALIASES.get(f, f) for f in prefer_formats)
+        self.all_variants = all_variants
+        self._rule_cache: Dict[str, Dict[str, List[Callable]]] = {}
+        if not parser_available(parser):
+            print(f"[warn] HTML parser '{parser}' not installed; using html.parser")
+            parser = "html.parser"
+        self.parser = parser
+        self.strained = strained
+        # Text harvested alongside each final image URL (e.g. menu item names)
+        self.image_meta: Dict[str, Dict[str, str]] = {}
+        # Final image URL -> first page it was found on
+        self.image_pages: Dict[str, str] = {}
+        self._meta_lock = threading.Lock()
         self.stats = ScrapeStats()
+        # --delay keeps its meaning as the spacing between requests to one host
+        default_rate = (1.0 / delay_sec) if delay_sec > 0 else 0.0
+        # User patterns go first so they win over the built-in CDN defaults
+        rates = dict(host_rates or {})
+        rates.update({k: v for k, v in DEFAULT_HOST_RATES.items() if k not in rates})
+        self.limiter = HostRateLimiter((default_rate, 1.0), rates)
 
         # Decide whether to try Playwright
         if use_playwright is None:
             try:
                 import importlib
-                importlib.import_module("playwright.sync_api")
+                importlib.import_module("playwright.async_api")
                 self.use_playwright = True
             except Exception:
                 self.use_playwright = False
         else:
             self.use_playwright = use_playwright
+        self.browser_pool = BrowserPool(browser_pages, block_resources) if self.use_playwright else None
+        self.pw_capture = pw_capture
 
         # Requests Session with retries
         self.session = requests.Session()
@@ -180,7 +1567,8 @@ class ImageScraper:
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["GET", "HEAD"]
         )
-        adapter = HTTPAdapter(max_retries=retries)
+        # Size the connection pool so every worker can hold a keep-alive connection
+        adapter = HTTPAdapter(max_retries=retries, pool_maxsize=max(10, self.workers))
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
 
@@ -188,6 +1576,9 @@ class ImageScraper:
         ensure_dir(self.images_dir)
         for folder in SUPPORTED_SOURCES.values():
             ensure_dir(self.images_dir / folder)
+        ensure_dir(self.images_dir / PAGE_CACHE_DIR)
+        self.blobs = BlobStore(self.images_dir / BLOB_DIR)
+        self.index = DownloadIndex(self.images_dir / INDEX_FILENAME)
 
     # ------------------------------ High-level API ------------------------------
     def run(self) -> None:
@@ -197,22 +1588,382 @@ class ImageScraper:
             return
 
         print(f"Found {len(links)} URL(s) in {self.readme_path}")
+        # Pages of one source stay sequential (in Links.md order); sources run side by side
+        by_source: Dict[str, List[Tuple[str, str, Path]]] = {}
         for url in links:
             src_key = domain_key(url)
             if not src_key:
                 print(f"[skip] Unknown/unsupported source for {url}")
                 continue
             folder = self.images_dir / SUPPORTED_SOURCES[src_key]
-            self._scrape_page(url, src_key, folder)
-            time.sleep(self.delay_sec)
+            by_source.setdefault(src_key, []).append((url, src_key, folder))
+
+        if self.workers > 1:
+            self._downloads = DownloadQueue(self._download_one, self.workers, self.queue_size)
+        try:
+            page_workers = min(self.page_workers, len(by_source))
+            if page_workers <= 1:
+                for pages in by_source.values():
+                    self._crawl_source(pages)
+            else:
+                with ThreadPoolExecutor(max_workers=page_workers, thread_name_prefix="page") as pool:
+                    list(pool.map(self._crawl_source, by_source.values()))
+        finally:
+            if self._downloads is not None:
+                self._downloads.close()
+                self._downloads = None
+
+        self._finish_run()
+
+    def _crawl_source(self, pages: List[Tuple[str, str, Path]]) -> None:
+        for url, src_key, folder in pages:
+            try:
+                self._scrape_page(url, src_key, folder)
+            except Exception as e:
+                # One broken page must not take the other sources' threads down with it
+                print(f"[error] {url}: {e}")
+
+    def _finish_run(self) -> None:
+        if self.browser_pool is not None:
+            self.browser_pool.close()
+        self._post_process()
+        self.index.close()
 
-        # Summary
         print("\n== Summary ==")
         print(f"Pages seen:        {self.stats.pages_seen}")
         print(f"Images discovered: {self.stats.images_found}")
         print(f"Images saved:      {self.stats.images_downloaded}")
+        print(f"Images skipped:    {self.stats.images_skipped}")
+        print(f"Images unchanged:  {self.stats.images_not_modified} (304)")
+        print(f"Duplicate bodies:  {self.stats.images_deduped}")
+        print(f"Near-duplicates:   {self.stats.images_near_dupes}")
+        print(f"Rejected bodies:   {self.stats.images_rejected} (not an image / too small / too big)")
         print(f"Images failed:     {self.stats.images_failed}")
 
+    # ------------------------------ Post-processing ------------------------------
+    def _post_process(self) -> None:
+        if self.near_dup_distance is not None:
+            self._prune_near_duplicates(self.near_dup_distance)
+        if self.optimize:
+            self._render_variants()
+        if self.placeholders:
+            self._write_placeholders()
+        assets = self._write_manifest()
+        if self.menu_path is not None:
+            self._match_menu(assets)
+
+    def _source_image_entries(self) -> List[Dict]:
+        folders = set(SUPPORTED_SOURCES.values())
+        return [
+            e for e in self.index.entries()
+            if e.get("path", "").split("/", 1)[0] in folders
+            and not e.get("duplicate_of")
+            and (self.images_dir / e["path"]).is_file()
+        ]
+
+    def _prune_near_duplicates(self, max_distance: int) -> None:
+        # One hash per unique blob; hardlinked copies share the result
+        by_blob: Dict[str, List[Dict]] = {}
+        for e in self._source_image_entries():
+            by_blob.setdefault(e["sha256"], []).append(e)
+        if not by_blob:
+            return
+        print(f"\n[dedupe] Hashing {len(by_blob)} unique image(s)…")
+        with ThreadPoolExecutor(max_workers=max(4, self.workers)) as pool:
+            hashes = dict(zip(by_blob, pool.map(
+                lambda d: dhash_file(self.images_dir / by_blob[d][0]["path"]), by_blob)))
+
+        hashed = [(d, h) for d, h in hashes.items() if h is not None]
+        if not hashed:
+            print("[dedupe] Nothing decodable (is Pillow installed?)")
+            return
+        # Best first, so the first member of every cluster is its representative: most
+        # pixels, then lossless over lossy, then preferred format; bytes (less aggressive
+        # compression) only decide between files of the same format
+        def quality(dh):
+            ext = Path(by_blob[dh[0]][0]["path"]).suffix.lower()
+            fmt = FORMAT_ALIASES.get(ext.lstrip("."), ext.lstrip("."))
+            rank = self.prefer_formats.index(fmt) if fmt in self.prefer_formats else len(self.prefer_formats)
+            return dh[1][1] * dh[1][2], ext in LOSSLESS_EXT, -rank, by_blob[dh[0]][0]["size"]
+        hashed.sort(key=quality, reverse=True)
+
+        tree = BKTree()
+        clusters: Dict[str, List[str]] = {}
+        for digest, (h, _, _) in hashed:
+            matches = tree.find(h, max_distance)
+            if matches:
+                keep = min(matches, key=lambda m: m[0])[1]
+                clusters[keep].append(digest)
+            else:
+                tree.add(h, digest)
+                clusters[digest] = []
+
+        report = []
+        for keep, drops in clusters.items():
+            if not drops:
+                continue
+            keep_path = by_blob[keep][0]["path"]
+            dropped = []
+            for digest in drops:
+                for e in by_blob[digest]:
+                    (self.images_dir / e["path"]).unlink(missing_ok=True)
+                    # Remember the decision so reruns skip the URL instead of re-fetching it
+                    fields = {k: v for k, v in e.items() if k not in ("url", "fetched_at")}
+                    self.index.put(e["url"], **fields, duplicate_of=keep_path)
+                    dropped.append(e["path"])
+                    self.stats.incr("images_near_dupes")
+            report.append({"keep": keep_path, "dropped": dropped})
+            print(f"[dedupe] keep {keep_path}, dropped {len(dropped)}")
+
+        (self.images_dir / "near-duplicates.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    def _render_variants(self) -> None:
+        formats = encodable_formats(self.variant_formats)
+        skipped = [f for f in self.variant_formats if f not in formats]
+        if skipped:
+            print(f"[optimize] This Pillow build can't write {', '.join(skipped)}; skipping")
+        if not formats:
+            return
+
+        # SVGs are already resolution-independent (and Pillow can't decode them)
+        by_blob: Dict[str, Dict] = {}
+        for e in self._source_image_entries():
+            if Path(e["path"]).suffix != ".svg":
+                by_blob.setdefault(e["sha256"], e)
+        out_dir = self.optimize_dir
+        ensure_dir(out_dir)
+        cache_path = out_dir / VARIANT_CACHE
+        try:
+            cache = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cache = {}
+
+        # Same bytes + same settings + outputs still on disk = nothing to do
+        settings = {"widths": list(self.variant_widths), "formats": formats, "quality": VARIANT_QUALITY}
+        todo = [
+            digest for digest in by_blob
+            if not (
+                digest in cache and cache[digest].get("settings") == settings
+                and all((out_dir / v["path"]).is_file() for v in cache[digest]["variants"])
+            )
+        ]
+        print(f"\n[optimize] {len(by_blob)} image(s), {len(todo)} to render with {self.optimize_procs} process(es)")
+        if todo:
+            with ProcessPoolExecutor(max_workers=self.optimize_procs) as pool:
+                futures = {
+                    pool.submit(render_variants, str(self.images_dir / by_blob[d]["path"]), d, str(out_dir),
+                                self.variant_widths, tuple(formats)): d
+                    for d in todo
+                }
+                for fut in as_completed(futures):
+                    digest = futures[fut]
+                    try:
+                        variants = fut.result()
+                    except Exception as e:
+                        print(f"[optimize] {by_blob[digest]['path']}: {e}")
+                        continue
+                    cache[digest] = {"source": by_blob[digest]["path"], "settings": settings, "variants": variants}
+                    print(f"[optimize] {by_blob[digest]['path']} -> {len(variants)} file(s)")
+        tmp = cache_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(cache, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, cache_path)
+        self.variants = {d: cache[d]["variants"] for d in by_blob if d in cache}
+
+    def _write_placeholders(self) -> None:
+        try:
+            import numpy  # noqa: F401
+            from PIL import Image  # noqa: F401
+        except Exception:
+            print("[lqip] NumPy and Pillow are required for placeholders; skipping")
+            return
+        paths: Dict[str, List[str]] = {}
+        for e in self._source_image_entries():
+            if Path(e["path"]).suffix != ".svg":
+                paths.setdefault(e["sha256"], []).append(e["path"])
+        sidecar = self.images_dir / PLACEHOLDERS_FILENAME
+        try:
+            cache = json.loads(sidecar.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cache = {}
+
+        # Keyed by blob hash: unchanged bytes keep their placeholder across runs
+        todo = [d for d in paths if d not in cache]
+        print(f"\n[lqip] {len(paths)} image(s), {len(todo)} new")
+        with ThreadPoolExecutor(max_workers=max(4, self.workers)) as pool:
+            for digest, ph in zip(todo, pool.map(lambda d: placeholder_for(self.images_dir / paths[d][0]), todo)):
+                if ph is None:
+                    print(f"[lqip] could not decode {paths[digest][0]}")
+                else:
+                    cache[digest] = ph
+        out = {d: {**cache[d], "paths": sorted(p)} for d, p in sorted(paths.items()) if d in cache}
+        tmp = sidecar.with_suffix(".tmp")
+        tmp.write_text(json.dumps(out, indent=1), encoding="utf-8")
+        os.replace(tmp, sidecar)
+
+    def _write_manifest(self) -> List[Dict]:
+        """images/manifest.json: one record per kept asset (unique body) with where it
+        came from, the text found next to it and every file derived from it."""
+        def load(path: Path) -> Dict:
+            try:
+                return json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return {}
+
+        variants = self.variants or {d: v["variants"] for d, v in load(self.optimize_dir / VARIANT_CACHE).items()}
+        placeholders = load(self.images_dir / PLACEHOLDERS_FILENAME)
+        folder_source = {folder: key for key, folder in SUPPORTED_SOURCES.items()}
+
+        assets: Dict[str, Dict] = {}
+        for e in sorted(self._source_image_entries(), key=lambda e: e["path"]):
+            a = assets.get(e["sha256"])
+            if a is None:
+                dims = (e["width"], e["height"]) if e.get("width") else self._file_dims(self.images_dir / e["path"])
+                a = assets[e["sha256"]] = {
+                    "sha256": e["sha256"],
+                    "path": e["path"],
+                    "bytes": e["size"],
+                    "width": dims[0] if dims else None,
+                    "height": dims[1] if dims else None,
+                    "files": [],
+                    "origins": [],
+                    "text": {},
+                }
+            a["files"].append(e["path"])
+            a["origins"].append({
+                "url": e["url"], "page": e.get("page"), "source": folder_source[e["path"].split("/", 1)[0]],
+                **({"text": e["meta"]} if e.get("meta") else {}),
+            })
+            for k, v in (e.get("meta") or {}).items():
+                a["text"].setdefault(k, v)
+        # Near-duplicates pruned into a kept file still say where that image appeared
+        by_path = {f: a for a in assets.values() for f in a["files"]}
+        for e in self.index.entries():
+            a = by_path.get(e.get("duplicate_of"))
+            if a is None:
+                continue
+            a["origins"].append({
+                "url": e["url"], "page": e.get("page"), "source": folder_source.get(e["path"].split("/", 1)[0]),
+                "near_duplicate": True, **({"text": e["meta"]} if e.get("meta") else {}),
+            })
+            for k, v in (e.get("meta") or {}).items():
+                a["text"].setdefault(k, v)
+        for digest, a in assets.items():
+            if digest in variants:
+                a["variants"] = [
+                    {**v, "path": Path(os.path.relpath(self.optimize_dir / v["path"], self.images_dir)).as_posix()}
+                    for v in variants[digest]
+                ]
+            if digest in placeholders:
+                a["placeholder"] = {k: placeholders[digest][k] for k in ("blurhash", "lqip", "color")}
+
+        path = self.images_dir / MANIFEST_FILENAME
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"generated_at": int(time.time()), "assets": list(assets.values())}, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+        print(f"\n[manifest] {len(assets)} asset(s) -> {path}")
+        return list(assets.values())
+
+    def _match_menu(self, assets: List[Dict]) -> None:
+        """Propose one image per menu id from the text harvested next to each asset,
+        written as a JSON Patch against the menu file (confidence rides along on
+        each operation as an extra member)."""
+        try:
+            menu = json.loads(self.menu_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[menu] Can't read {self.menu_path}: {e}")
+            return
+        matcher = MenuMatcher([item.get("name", "") for item in menu])
+
+        # Best score per (item, asset) over all of the asset's text fields
+        best: Dict[Tuple[int, int], Tuple[float, str, str]] = {}
+        for a_idx, asset in enumerate(assets):
+            # The asset's own text plus whatever each origin (incl. pruned near-duplicates) had
+            fields = {(f, t) for d in [asset.get("text", {})] + [o.get("text", {}) for o in asset["origins"]] for f, t in d.items()}
+            for fld, text in sorted(fields):
+                weight = MATCH_FIELD_WEIGHTS.get(fld, 0.7)
+                for score, i_idx in matcher.match(text):
+                    score *= weight
+                    if score >= self.match_threshold and score > best.get((i_idx, a_idx), (0.0,))[0]:
+                        best[(i_idx, a_idx)] = (score, fld, text)
+
+        # Greedy one-to-one assignment, strongest pairs first; wider images win ties
+        ranked = sorted(best.items(), key=lambda kv: (kv[1][0], assets[kv[0][1]].get("width") or 0), reverse=True)
+        taken_items: Set[int] = set()
+        taken_assets: Set[int] = set()
+        ops = []
+        for (i_idx, a_idx), (score, fld, text) in ranked:
+            if i_idx in taken_items or a_idx in taken_assets:
+                continue
+            taken_items.add(i_idx)
+            taken_assets.add(a_idx)
+            item = menu[i_idx]
+            value = self._public_path(assets[a_idx])
+            if item.get("image") == value:
+                continue
+            ops.append({
+                "op": "replace" if "image" in item else "add",
+                "path": f"/{i_idx}/image",
+                "value": value,
+                "id": item.get("id"),
+                "confidence": round(score, 3),
+                "matched": {"field": fld, "text": text},
+                "sha256": assets[a_idx]["sha256"],
+            })
+            print(f"[menu] {item.get('id')} <- {value} ({score:.2f}, {fld}: {text!r})")
+        ops.sort(key=lambda op: int(op["path"].split("/")[1]))
+
+        path = self.images_dir / MENU_PATCH_FILENAME
+        path.write_text(json.dumps(ops, indent=1, ensure_ascii=False), encoding="utf-8")
+        print(f"[menu] {len(ops)} of {len(menu)} item(s) matched -> {path}")
+
+    def _public_path(self, asset: Dict) -> str:
+        # Site path for an asset: its widest JPEG variant when --optimize rendered one
+        # inside the images dir, else the kept original, under --public-prefix
+        jpegs = [v for v in asset.get("variants", ()) if v["format"] == "jpeg" and not v["path"].startswith("../")]
+        rel = max(jpegs, key=lambda v: v["width"])["path"] if jpegs else asset["path"]
+        return f"{self.public_prefix}/{rel}"
+
+    def _file_dims(self, path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            with open(path, "rb") as f:
+                return header_dims(f.read(PROBE_BYTES))
+        except OSError:
+            return None
+
+    # ------------------------------ Parser Benchmark ------------------------------
+    def benchmark_parsers(self, fixtures: List[Path], repeat: int = 5) -> None:
+        """Time parse+extract for each available backend on saved HTML pages,
+        against the html.parser/full-tree baseline."""
+        if not fixtures:
+            fixtures = sorted((self.images_dir / PAGE_CACHE_DIR).glob("*.html"))
+        if not fixtures:
+            print(f"No fixtures given and no cached pages in {self.images_dir / PAGE_CACHE_DIR}")
+            return
+        saved = (self.parser, self.strained)
+        try:
+            for fixture in fixtures:
+                html = Path(fixture).read_text(encoding="utf-8", errors="ignore")
+                print(f"\n[bench] {fixture} ({len(html) / 1024:.0f} KiB, best of {repeat})")
+                baseline = None
+                for backend in PARSER_BACKENDS:
+                    if not parser_available(backend):
+                        print(f"  {backend:<12} {'':<9} not installed")
+                        continue
+                    for strained in (False, True):
+                        self.parser, self.strained = backend, strained
+                        best = float("inf")
+                        for _ in range(repeat):
+                            t0 = time.perf_counter()
+                            urls = self._extract_images("https://example.invalid/", html, "generic")
+                            best = min(best, time.perf_counter() - t0)
+                        if baseline is None:
+                            baseline = (best, set(urls))
+                        same = "" if set(urls) == baseline[1] else "  (differs from baseline)"
+                        print(f"  {backend:<12} {'strained' if strained else 'full':<9} "
+                              f"{best * 1000:8.1f} ms  x{baseline[0] / best:5.1f}  {len(urls)} url(s){same}")
+        finally:
+            self.parser, self.strained = saved
+
     # ------------------------------ Link Reading ------------------------------
     def _read_links(self, path: Path) -> List[str]:
         text = path.read_text(encoding="utf-8", errors="ignore")
@@ -226,142 +1977,270 @@ class ImageScraper:
 
     # ------------------------------ Page Scraping ------------------------------
     def _scrape_page(self, url: str, src_key: str, out_dir: Path) -> None:
+        pending = self._scrape_one(url, src_key, out_dir)
+        seen = {url}
+        wave = self._gallery_wave(pending, seen)
+        if not wave:
+            return
+        with ThreadPoolExecutor(max_workers=GALLERY_FETCH_WORKERS, thread_name_prefix="gallery") as pool:
+            while wave:
+                print(f"[info] Following {len(wave)} more gallery page(s) of {url}")
+                found = pool.map(lambda u: self._scrape_one(u, src_key, out_dir), wave)
+                wave = self._gallery_wave([n for links in found for n in links], seen)
+
+    def _gallery_wave(self, pending: List[str], seen: Set[str]) -> List[str]:
+        # Next batch of unvisited gallery pages, within the --max-pages budget
+        budget = self.max_pages - len(seen)
+        if budget <= 0:
+            return []
+        wave = [u for u in uniq(pending) if u not in seen][:budget]
+        seen.update(wave)
+        return wave
+
+    def _scrape_one(self, url: str, src_key: str, out_dir: Path) -> List[str]:
+        """Scrape a single page; returns the gallery pages it links to."""
         print(f"\n[page] {url} -> {out_dir.name}")
-        self.stats.pages_seen += 1
+        self.stats.incr("pages_seen")
 
         html = self._fetch_html(url)
-        image_urls: List[str] = []
+        ctx = ExtractContext()
+        found = 0
+        for u in self._iter_image_urls(url, src_key, html, out_dir, ctx):
+            found += 1
+            self.stats.incr("images_found")
+            if self._downloads is not None:
+                self._downloads.put(u, out_dir, url)
+            else:
+                self._download_one(u, out_dir, url)
+        if not found:
+            print(f"[warn] No new images found on {url}")
+        else:
+            print(f"[info] Found {found} image URL(s) on {url}")
+        return gallery_links(url, ctx.pages) if self.max_pages > 1 else []
+
+    def _iter_image_urls(
+        self, url: str, src_key: str, html: Optional[str], out_dir: Path, ctx: Optional[ExtractContext] = None
+    ) -> Iterator[str]:
+        """Normalize, filter, canonicalize and dedup one URL at a time, so the first
+        download starts while the rest of the page is still being walked."""
+        candidates = 0
         if html:
-            soup = BeautifulSoup(html, "html.parser")
-            image_urls.extend(self._extract_general_images(url, soup))
-            # Source-specific passes (prioritize domain logic)
-            if src_key == "yelp":
-                image_urls.extend(self._extract_yelp(url, soup))
-            elif src_key == "northjersey":
-                image_urls.extend(self._extract_northjersey(url, soup))
-            elif src_key == "grubhub":
-                image_urls.extend(self._extract_grubhub(url, soup))
-            elif src_key == "doordash":
-                image_urls.extend(self._extract_doordash(url, soup))
-
-        image_urls = [sanitize_img_url(self._normalize_img_url(url, u)) for u in image_urls]
-        image_urls = [u for u in image_urls if self._is_image_like(u)]
-        image_urls = uniq(image_urls)
-
-        if not image_urls and self.use_playwright:
+            ctx = ctx if ctx is not None else ExtractContext()
+            for raw in self._walk_page(url, html, src_key, ctx):
+                u = sanitize_img_url(self._normalize_img_url(url, raw))
+                if self._is_image_like(u):
+                    candidates += 1
+                    self._remember_meta(u, ctx.meta.get(raw))
+                    claimed = self._claim(u, out_dir, url)
+                    if claimed:
+                        yield claimed
+
+        if not candidates and self.use_playwright:
             print("[info] No images via requests/bs4; trying Playwright…")
-            image_urls = self._extract_with_playwright(url, src_key)
-            image_urls = [u for u in image_urls if self._is_image_like(u)]
-            image_urls = [sanitize_img_url(u) for u in image_urls]
-            image_urls = uniq(image_urls)
+            urls, captured = self._extract_with_playwright(url, src_key)
+            for u in uniq(urls + list(captured)):
+                claimed = self._claim(sanitize_img_url(u), out_dir, url)
+                if not claimed:
+                    continue
+                if claimed in captured:
+                    # The browser already holds the body of the variant we want
+                    self.stats.incr("images_found")
+                    self._save_captured(claimed, *captured[claimed], out_dir)
+                else:
+                    yield claimed
 
-        if not image_urls:
-            print("[warn] No images found.")
-            return
+    def _claim(self, url: str, out_dir: Path, page_url: str) -> Optional[str]:
+        # One URL per CDN asset, rewritten to the variant we want; None once the
+        # asset has already been handed out for this folder (by any page)
+        asset_id = preferred = url
+        if not self.all_variants:
+            fmt = self.prefer_formats[0] if self.prefer_formats else "jpeg"
+            asset_id, _, preferred = canonicalize_url(url, self.max_width, fmt)
+            if preferred != url:
+                self._remember_meta(preferred, self.image_meta.get(url))
+        key = (str(out_dir), asset_id)
+        with self._seen_lock:
+            if key in self._seen:
+                return None
+            self._seen.add(key)
+            self.image_pages.setdefault(preferred, page_url)
+        return preferred
 
-        print(f"[info] Found {len(image_urls)} candidate image URL(s)")
-        self.stats.images_found += len(image_urls)
-        self._download_all(image_urls, out_dir, page_url=url)
+    def _remember_meta(self, url: str, meta: Optional[Dict[str, str]]) -> None:
+        if not meta:
+            return
+        with self._meta_lock:
+            known = self.image_meta.setdefault(url, {})
+            for k, v in meta.items():
+                known.setdefault(k, v)
 
     def _fetch_html(self, url: str) -> Optional[str]:
+        entry, cached = self._cached_page(url)
+        self.limiter.acquire(url)
         try:
-            r = self.session.get(url, headers={**DEFAULT_HEADERS, "Accept": DEFAULT_HEADERS.get("Accept", "*/*")}, timeout=self.timeout)
+            headers = {**DEFAULT_HEADERS, "Accept": DEFAULT_HEADERS.get("Accept", "*/*"), **conditional_headers(entry)}
+            r = self.session.get(url, headers=headers, timeout=self.timeout)
+            if r.status_code == 304 and cached is not None:
+                print("[info] Page not modified; using cached copy")
+                return cached
             r.raise_for_status()
+            self._store_page(url, r.text, r.headers)
             return r.text
         except Exception as e:
             print(f"[warn] Failed to fetch HTML: {e}")
             return None
 
+    def _cached_page(self, url: str) -> Tuple[Optional[Dict], Optional[str]]:
+        entry = None if self.refresh else self.index.get(url)
+        if not entry:
+            return None, None
+        try:
+            return entry, (self.images_dir / entry["path"]).read_text(encoding="utf-8")
+        except OSError:
+            return None, None
+
+    def _store_page(self, url: str, text: str, headers) -> None:
+        fpath = self.images_dir / PAGE_CACHE_DIR / (sha1_name(url) + ".html")
+        data = text.encode("utf-8")
+        fpath.write_bytes(data)
+        self._record_download(url, fpath, len(data), hashlib.sha256(data).hexdigest(), headers)
+
     # ------------------------------ Extractors ------------------------------
-    def _extract_general_images(self, base_url: str, soup: BeautifulSoup) -> List[str]:
-        urls: Set[str] = set()
-        # <img src>, data-src, data-lazy, data-original
-        for img in soup.find_all("img"):
-            for attr in ("src", "data-src", "data-lazy", "data-original"):
-                v = img.get(attr)
-                if v:
-                    urls.add(v)
-            # srcset (multiple candidates)
-            srcset = img.get("srcset")
-            if srcset:
-                for part in srcset.split(","):
-                    cand = part.strip().split(" ")[0]
-                    if cand:
-                        urls.add(cand)
+    def _extract_images(self, base_url: str, html: str, src_key: str) -> List[str]:
+        return list(self._extract_page(base_url, html, src_key).urls)
+
+    def _extract_page(self, base_url: str, html: str, src_key: str) -> ExtractContext:
+        ctx = ExtractContext()
+        for _ in self._walk_page(base_url, html, src_key, ctx):
+            pass
+        return ctx
+
+    def _walk_page(self, base_url: str, html: str, src_key: str, ctx: ExtractContext) -> Iterator[str]:
+        """Single pass over the parsed page: every element is visited once and handed
+        to the rules registered for its tag (and to style rules if it has a style).
+        Yields each raw URL as soon as a rule finds it."""
+        rules = self._rules_for(src_key)
+        style_rules = rules.get("@style", ())
+        for el, ctx.picture in iter_elements(html, self.parser, self.strained):
+            for rule in rules.get(el.name, ()):
+                rule(el, ctx)
+            if style_rules and el.get("style"):
+                for rule in style_rules:
+                    rule(el, ctx)
+            if ctx.fresh:
+                yield from ctx.drain()
+        # <picture> blocks that never got an <img>: resolve their sources on their own
+        for cands in ctx.pictures.values():
+            ctx.add(self._pick_variants([], cands))
+        yield from ctx.drain()
+
+    def _rules_for(self, src_key: str) -> Dict[str, List[Callable]]:
+        rules = self._rule_cache.get(src_key)
+        if rules is None:
+            rules = {}
+            for table in (GENERIC_RULES, SOURCE_RULES.get(src_key, {})):
+                for tag, names in table.items():
+                    rules.setdefault(tag, []).extend(getattr(self, n) for n in names)
+            self._rule_cache[src_key] = rules
+        return rules
+
+    def _rule_img(self, el, ctx: "ExtractContext") -> None:
+        # <img src>, data-src, data-lazy, data-original, srcset, and any <source> siblings
+        picture = ctx.pictures.pop(ctx.picture, []) if ctx.picture is not None else []
+        ctx.add(
+            self._img_urls(el, picture),
+            alt=clean_text(el.get("alt")),
+            title=clean_text(el.get("title")),
+            caption=figure_caption(el),
+        )
+
+    def _rule_source(self, el, ctx: "ExtractContext") -> None:
         # <source> in <picture> blocks (often holds AVIF/WEBP variants)
-        for src in soup.find_all("source"):
-            typ = (src.get("type") or "").lower()
-            if (typ.startswith("image/") or typ in ("avif", "webp")) or src.get("srcset"):
-                ss = src.get("srcset") or ""
-                for part in ss.split(","):
-                    cand = part.strip().split(" ")[0]
-                    if cand:
-                        urls.add(cand)
-            s = src.get("src")
-            if s:
-                urls.add(s)
-        # CSS inline background-image
-        for tag in soup.find_all(style=True):
-            style = tag.get("style") or ""
-            m = re.search(r"background-image\s*:\s*url\((['\"]?)([^'\")]+)\1\)", style, flags=re.I)
-            if m:
-                urls.add(m.group(2))
+        typ = (el.get("type") or "").lower()
+        if not self.all_variants and ctx.picture is not None:
+            # Held until the picture's <img> arrives so all variants compete in one pick
+            ctx.pictures.setdefault(ctx.picture, []).extend(parse_srcset(el.get("srcset") or el.get("src"), typ or None))
+            return
+        if (typ.startswith("image/") or typ in ("avif", "webp")) or el.get("srcset"):
+            ctx.add(self._pick_variants([], parse_srcset(el.get("srcset"), typ or None)))
+        s = el.get("src")
+        if s:
+            ctx.add([s])
+
+    def _rule_meta_image(self, el, ctx: "ExtractContext") -> None:
         # OpenGraph / Twitter cards
-        for sel, attr in (("meta[property='og:image']", "content"),
-                          ("meta[name='twitter:image']", "content")):
-            for tag in soup.select(sel):
-                v = tag.get(attr)
-                if v:
-                    urls.add(v)
-        return list(urls)
-
-    def _extract_yelp(self, base_url: str, soup: BeautifulSoup) -> List[str]:
-        urls: Set[str] = set()
-        for img in soup.find_all("img"):
-            for attr in ("src", "data-src", "data-original"):
-                v = img.get(attr)
-                if v and ("photo" in v or "bphoto" in v):
-                    urls.add(v)
-            srcset = img.get("srcset")
-            if srcset and ("photo" in srcset or "bphoto" in srcset):
-                for part in srcset.split(","):
-                    cand = part.strip().split(" ")[0]
-                    if cand:
-                        urls.add(cand)
-        for tag in soup.find_all(style=True):
-            style = tag.get("style") or ""
-            m = re.search(r"url\((['\"]?)([^'\")]+)\1\)", style, flags=re.I)
-            if m and ("photo" in m.group(2) or "bphoto" in m.group(2)):
-                urls.add(m.group(2))
-        for tag in soup.select("meta[property='og:image']"):
-            v = tag.get("content")
+        if el.get("property") == "og:image" or el.get("name") == "twitter:image":
+            v = el.get("content")
             if v:
-                urls.add(v)
-        return list(urls)
-
-    def _extract_northjersey(self, base_url: str, soup: BeautifulSoup) -> List[str]:
-        urls: Set[str] = set()
-        tag = soup.find("meta", attrs={"property": "og:image"})
-        if tag and tag.get("content"):
-            urls.add(tag["content"])
-        for img in soup.select("figure img, article img, img[src]"):
-            for attr in ("src", "data-src", "data-original"):
-                v = img.get(attr)
-                if v:
-                    urls.add(v)
-            ss = img.get("srcset")
-            if ss:
-                for part in ss.split(","):
-                    cand = part.strip().split(" ")[0]
-                    if cand:
-                        urls.add(cand)
-        return list(urls)
+                ctx.add([v])
+
+    def _rule_bg_image(self, el, ctx: "ExtractContext") -> None:
+        # CSS inline background-image
+        m = CSS_BG_IMAGE_RE.search(el.get("style") or "")
+        if m:
+            ctx.add([m.group(2)])
 
-    def _extract_grubhub(self, base_url: str, soup: BeautifulSoup) -> List[str]:
-        return self._extract_general_images(base_url, soup)
+    def _rule_yelp_css_photo(self, el, ctx: "ExtractContext") -> None:
+        # Yelp grids set photos via shorthand `background: url(...)` too
+        m = CSS_URL_RE.search(el.get("style") or "")
+        if m and ("photo" in m.group(2) or "bphoto" in m.group(2)):
+            ctx.add([m.group(2)])
 
-    def _extract_doordash(self, base_url: str, soup: BeautifulSoup) -> List[str]:
-        return self._extract_general_images(base_url, soup)
+    def _rule_embedded_json(self, el, ctx: "ExtractContext") -> None:
+        # __NEXT_DATA__ / ld+json / inline state caches carry the menu with its photos,
+        # so JS-heavy pages yield images without the Playwright fallback
+        text = el.string
+        if not text or len(text) < 32:
+            return
+        typ = (el.get("type") or "").lower()
+        is_json = typ in ("application/json", "application/ld+json") or el.get("id") == "__NEXT_DATA__"
+        if not is_json and "__" not in text:
+            return
+        for blob in iter_json_blobs(str(text), is_json):
+            for url, name in iter_json_images(blob):
+                ctx.add([url], name=name)
+
+    def _rule_rel_next(self, el, ctx: "ExtractContext") -> None:
+        # <link rel="next"> / <a rel="next"> pagination hints
+        href = el.get("href")
+        if href and "next" in attr_text(el, "rel").lower().split():
+            ctx.pages[href] = None
+
+    def _rule_yelp_page_link(self, el, ctx: "ExtractContext") -> None:
+        # biz_photos grids page with ?start=30, 60, … and link several pages ahead
+        href = el.get("href") or ""
+        if "start=" in href and "biz_photos" in href:
+            ctx.pages[href] = None
+        else:
+            self._rule_rel_next(el, ctx)
+
+    def _rule_gallery_next(self, el, ctx: "ExtractContext") -> None:
+        # Gannett picture galleries link the following slide from a "next" control
+        href = el.get("href")
+        if not href:
+            return
+        label = f"{attr_text(el, 'class')} {el.get('aria-label') or ''} {el.get('data-action') or ''}".lower()
+        if "next" in label:
+            ctx.pages[href] = None
+        else:
+            self._rule_rel_next(el, ctx)
+
+    def _img_urls(self, img, picture: List[SrcCandidate] = (), attrs: Iterable[str] = IMG_SRC_ATTRS) -> List[str]:
+        """URLs to fetch for one <img>: its plain src attributes, or a single pick from
+        its srcset and the enclosing <picture>'s <source> variants."""
+        plain = [v for v in (img.get(a) for a in attrs) if v]
+        cands = list(picture) + parse_srcset(img.get("srcset") or img.get("data-srcset"))
+        return self._pick_variants(plain, cands)
+
+    def _pick_variants(self, plain: List[str], cands: List[SrcCandidate]) -> List[str]:
+        if self.all_variants:
+            return plain + [c.url for c in cands]
+        if not cands:
+            return plain
+        # Plain src is the implicit 1x candidate; it only competes when nothing has a width
+        cands = cands + [SrcCandidate(u, None, 1.0, url_format(u)) for u in plain if not u.startswith("data:")]
+        best = pick_srcset_candidate(cands, self.max_width, self.prefer_formats)
+        return [best.url] if best else plain
 
     def _is_image_like(self, url: str) -> bool:
         if not url:
@@ -382,141 +2261,153 @@ class ImageScraper:
 
     # ------------------------------ Playwright-aware downloader (fallback) ------------------------------
     def _playwright_download(self, img_url: str, out_dir: Path, page_url: str) -> bool:
-        try:
-            from playwright.sync_api import sync_playwright
-        except Exception:
+        if self.browser_pool is None:
             return False
+        referer = page_url or f"{urlparse(img_url).scheme}://{urlparse(img_url).hostname}"
 
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    user_agent=DEFAULT_HEADERS["User-Agent"],
-                    viewport={"width": 1600, "height": 1000},
-                )
-                if page_url:
-                    try:
-                        page = context.new_page()
-                        page.goto(page_url, timeout=60_000, wait_until="domcontentloaded")
-                        page.wait_for_timeout(2000)
-                    except Exception:
-                        pass
+        async def fetch(context):
+            # Cookies come from rendering the page once, not once per image
+            if page_url:
+                await self.browser_pool.warm(context, page_url)
+            resp = await context.request.get(
+                img_url,
+                headers={"Accept": "image/avif,image/webp,image/*,*/*;q=0.8", "Referer": referer},
+                timeout=60_000,
+            )
+            body = await resp.body() if resp.ok else b""
+            return resp.ok, resp.status, resp.headers, body
 
-                resp = context.request.get(
-                    img_url,
-                    headers={
-                        "Accept": "image/avif,image/webp,image/*,*/*;q=0.8",
-                        "Referer": page_url or f"{urlparse(img_url).scheme}://{urlparse(img_url).hostname}",
-                    },
-                    timeout=60_000,
-                )
-                if resp.ok:
-                    ct = resp.headers.get("content-type", "")
-                    ext = guess_ext(img_url, ct)
-                    name = sha1_name(img_url) + ext
-                    fpath = out_dir / name
-                    with open(fpath, "wb") as f:
-                        f.write(resp.body())
-                    print(f"[save:pw] {fpath.name}")
-                    context.close()
-                    browser.close()
-                    return True
-                else:
-                    print(f"[fail:pw] {img_url} -> HTTP {resp.status}")
-                    context.close()
-                    browser.close()
-                    return False
+        try:
+            ok, status, headers, body = self.browser_pool.run(host_of(referer), fetch)
         except Exception as e:
             print(f"[fail:pw] {img_url} -> {e}")
             return False
+        if not ok:
+            print(f"[fail:pw] {img_url} -> HTTP {status}")
+            return False
+        try:
+            ext, dims = self._screen_body(body[:PROBE_BYTES], len(body))
+        except RejectedBody as e:
+            self._reject(img_url, e)
+            return False
+        fpath = out_dir / (sha1_name(img_url) + ext)
+        tmp, digest, size = self._write_temp([body])
+        self._commit_download(img_url, tmp, digest, size, fpath, playwright_validators(headers), dims)
+        print(f"[save:pw] {fpath.name}")
+        return True
 
     # ------------------------------ Playwright Fallback ------------------------------
-    def _extract_with_playwright(self, url: str, src_key: str) -> List[str]:
-        try:
-            from playwright.sync_api import sync_playwright
-        except Exception as e:
-            print(f"[warn] Playwright not available: {e}")
-            return []
+    def _extract_with_playwright(
+        self, url: str, src_key: str
+    ) -> Tuple[List[str], Dict[str, Tuple[Dict[str, str], bytes]]]:
+        if self.browser_pool is None:
+            return [], {}
 
-        out: Set[str] = set()
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    user_agent=DEFAULT_HEADERS["User-Agent"],
-                    viewport={"width": 1600, "height": 1000},
-                )
-                page = context.new_page()
-                page.goto(url, timeout=60_000, wait_until="domcontentloaded")
-
-                # Give time for lazy images to hydrate and scroll to trigger lazy loading
-                page.wait_for_timeout(2_000)
-                for _ in range(8):
-                    page.mouse.wheel(0, 1200)
-                    page.wait_for_timeout(800)
+        captured: Dict[str, Tuple[Dict[str, str], bytes]] = {}
+        pending: List["asyncio.Task"] = []
+
+        async def grab(response) -> None:
+            try:
+                if response.status != 200 or response.url in captured:
+                    return
+                headers = await response.all_headers()
+                if not headers.get("content-type", "").lower().startswith("image/"):
+                    return
+                captured[response.url] = (headers, await response.body())
+            except Exception:
+                pass  # body evicted or page gone; the URL is still downloaded normally
+
+        def on_response(response) -> None:
+            pending.append(asyncio.ensure_future(grab(response)))
+
+        async def render(context):
+            page, tracker = await self.browser_pool.new_page(context)
+            if self.pw_capture:
+                # The browser already fetched every image it rendered; keep those bodies
+                page.on("response", on_response)
+            try:
+                await page.goto(url, timeout=60_000, wait_until="domcontentloaded")
+                self.browser_pool.mark_warm(url)
+
+                # Scroll to trigger lazy loading, stopping as soon as the page settles
+                await scroll_until_settled(page, tracker)
                 if src_key == "yelp":
                     try:
-                        grid_imgs = page.query_selector_all("img")
-                        if grid_imgs:
-                            grid_imgs[0].scroll_into_view_if_needed()
-                            page.wait_for_timeout(500)
+                        first = await page.query_selector("img")
+                        if first:
+                            await first.scroll_into_view_if_needed()
+                            await page.wait_for_timeout(500)
+                    except Exception:
+                        pass
+                found = await page.evaluate(PW_COLLECT_JS, list(IMG_SRC_ATTRS))
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+                # A snapshot: late responses may still land in `captured` until the
+                # listener is off and leftover grabs are cancelled below
+                return found, dict(captured)
+            finally:
+                if self.pw_capture:
+                    try:
+                        page.remove_listener("response", on_response)
                     except Exception:
                         pass
-                page.wait_for_timeout(7_000)
-
-                # Gather <img> attributes
-                img_handles = page.query_selector_all("img")
-                for img in img_handles:
-                    for attr in ("src", "data-src", "data-original", "data-lazy"):
-                        v = img.get_attribute(attr)
-                        if v:
-                            out.add(v)
-                    ss = img.get_attribute("srcset")
-                    if ss:
-                        for part in ss.split(","):
-                            cand = part.strip().split(" ")[0]
-                            if cand:
-                                out.add(cand)
-
-                # <source> elements (picture variants like avif/webp)
-                src_nodes = page.query_selector_all("source")
-                for node in src_nodes:
-                    ss = node.get_attribute("srcset") or ""
-                    for part in ss.split(","):
-                        cand = part.strip().split(" ")[0]
-                        if cand:
-                            out.add(cand)
-                    s = node.get_attribute("src")
-                    if s:
-                        out.add(s)
-
-                # CSS backgrounds
-                nodes = page.query_selector_all("[style*=background-image]")
-                for node in nodes:
-                    style = node.get_attribute("style") or ""
-                    m = re.search(r"url\((['\"]?)([^'\")]+)\1\)", style, flags=re.I)
-                    if m:
-                        out.add(m.group(2))
-
-                # OG/Twitter images
-                for sel in ["meta[property='og:image']", "meta[name='twitter:image']"]:
-                    for el in page.query_selector_all(sel):
-                        v = el.get_attribute("content")
-                        if v:
-                            out.add(v)
+                    for task in pending:
+                        task.cancel()
+                await page.close()
 
-                if src_key == "yelp":
-                    out = {u for u in out if ("photo" in u or "bphoto" in u) or self._is_image_like(u)}
-                context.close()
-                browser.close()
+        try:
+            found, kept = self.browser_pool.run(host_of(url), render)
         except Exception as e:
             print(f"[warn] Playwright extraction failed: {e}")
-            return []
+            return [], {}
+
+        out: Set[str] = set()
+        # <img> attributes
+        for img in found["imgs"]:
+            out.update(self._pick_variants(img["plain"], parse_srcset(img["srcset"])))
+        # <source> elements (picture variants like avif/webp)
+        for node in found["sources"]:
+            out.update(self._pick_variants([], parse_srcset(node["srcset"], node["type"])))
+            if node["src"]:
+                out.add(node["src"])
+        # CSS backgrounds
+        for style in found["styles"]:
+            m = CSS_URL_RE.search(style or "")
+            if m:
+                out.add(m.group(2))
+        # OG/Twitter images
+        out.update(found["metas"])
+
+        if src_key == "yelp":
+            out = {u for u in out if ("photo" in u or "bphoto" in u) or self._is_image_like(u)}
 
         # Normalize and filter
         out_list = [self._normalize_img_url(url, u) for u in out]
         out_list = [u for u in out_list if self._is_image_like(u)]
-        return uniq(out_list)
+        # Captured responses include logos, avatars and ads the page never shows as
+        # content: keep only URLs that pass the same filters, and on Yelp only photos
+        kept = {
+            u: v for u, v in kept.items()
+            if self._is_image_like(u) and (src_key != "yelp" or "photo" in u)
+        }
+        return uniq(out_list), kept
+
+    def _save_captured(self, img_url: str, headers: Dict[str, str], body: bytes, out_dir: Path) -> None:
+        # Same cache check, naming, blob store, index and stats as a normal download
+        entry = self._cached_entry(img_url, out_dir)
+        if entry and (not self.revalidate or entry.get("rejected")):
+            self._skip_cached(entry)
+            return
+        try:
+            ext, dims = self._screen_body(body[:PROBE_BYTES], len(body))
+        except RejectedBody as e:
+            self._reject(img_url, e)
+            return
+        fpath = out_dir / (sha1_name(img_url) + ext)
+        tmp, digest, size = self._write_temp([body])
+        self._commit_download(img_url, tmp, digest, size, fpath, playwright_validators(headers), dims)
+        self.stats.incr("images_downloaded")
+        print(f"[save:pw-net] {fpath.name}")
 
     # ------------------------------ URL Helpers ------------------------------
     def _normalize_img_url(self, base_url: str, u: str) -> str:
@@ -529,58 +2420,553 @@ class ImageScraper:
         return u
 
     # ------------------------------ Downloading ------------------------------
-    def _download_all(self, urls: List[str], out_dir: Path, page_url: str = "") -> None:
-        for u in urls:
-            self._download_one(u, out_dir, page_url)
-            time.sleep(self.delay_sec)
-
     def _download_one(self, url: str, out_dir: Path, page_url: str = "") -> None:
+        entry = self._cached_entry(url, out_dir)
+        if entry and (not self.revalidate or entry.get("rejected")):
+            self._skip_cached(entry)
+            return
+        part = self.blobs.part_path(url, out_dir)
+        offset, resume = (0, {}) if entry else self._resume_from(url, part)
+        self.limiter.acquire(url)
         try:
-            headers = {
-                "Accept": "image/avif,image/webp,image/*,*/*;q=0.8",
-                "Referer": page_url or (f"{urlparse(url).scheme}://{urlparse(url).hostname}")
-            }
+            headers = {**self._image_headers(url, page_url), **conditional_headers(entry), **resume}
             r = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+            if r.status_code == 304 and entry:
+                r.close()
+                self._mark_not_modified(entry, r.headers)
+                return
+            if r.status_code == 416:
+                part.unlink(missing_ok=True)  # stale .part; the next attempt starts over
             r.raise_for_status()
-            ext = guess_ext(url, r.headers.get("Content-Type"))
-            name = sha1_name(url) + ext
-            fpath = out_dir / name
-            with open(fpath, "wb") as f:
-                for chunk in r.iter_content(chunk_size=64 * 1024):
-                    if chunk:
-                        f.write(chunk)
-            self.stats.images_downloaded += 1
+            # Small reads while probing, so a rejected body costs a few KB, not a 64 KB block
+            chunks = r.iter_content(chunk_size=8 * 1024 if self.min_width else 64 * 1024)
+            head = b"" if r.status_code == 206 else take_head(chunks)
+            try:
+                sink, total = self._open_part(url, part, offset, r.status_code, r.headers, head)
+            except RejectedBody:
+                r.close()  # drop the connection instead of draining the rest
+                raise
+            fpath = out_dir / (sha1_name(url) + sink.ext)
+            try:
+                for chunk in chunks:
+                    sink.write(chunk)
+                digest = sink.finish(total)
+            except BaseException:
+                sink.abort()
+                raise
+            self._commit_download(url, part, digest, sink.size, fpath, r.headers, sink.dims)
+            self.stats.incr("images_downloaded")
             print(f"[save] {fpath.name}")
+        except RejectedBody as e:
+            self._reject(url, e)
         except Exception as e:
-            self.stats.images_failed += 1
+            self.stats.incr("images_failed")
             print(f"[fail] {url} -> {e}")
             if self.use_playwright and any(code in str(e) for code in ("403", "406")):
                 ok = self._playwright_download(url, out_dir, page_url)
                 if ok:
-                    self.stats.images_failed -= 1
-                    self.stats.images_downloaded += 1
+                    self.stats.incr("images_failed", -1)
+                    self.stats.incr("images_downloaded")
+
+    def _resume_from(self, url: str, part: Path) -> Tuple[int, Dict[str, str]]:
+        # Byte offset and Range/If-Range headers to continue an interrupted body, if any
+        state = None if self.refresh else (self.index.get(url) or {}).get("partial")
+        if not state or not part.is_file():
+            return 0, {}
+        have = part.stat().st_size
+        if not 0 < have < (state.get("total") or 0):
+            part.unlink(missing_ok=True)
+            return 0, {}
+        return have, {"Range": f"bytes={have}-", "If-Range": state["if_range"]}
+
+    def _open_part(
+        self, url: str, part: Path, offset: int, status: int, headers, head: bytes
+    ) -> Tuple[PartFile, Optional[int]]:
+        """Check a (possibly ranged) response and open the .part sink for its body,
+        seeded with the already-read `head`; returns (sink, expected final size).
+        Large bodies from servers that accept ranges are noted in the index up front,
+        so even a killed run can resume them."""
+        encoded = (headers.get("Content-Encoding") or "identity").lower() != "identity"
+        if status == 206:
+            rng = content_range(headers)
+            if rng is None or rng[0] != offset:
+                part.unlink(missing_ok=True)
+                raise IOError(f"unexpected Content-Range {headers.get('Content-Range')!r}")
+            try:
+                with open(part, "rb") as f:
+                    ext, dims = self._screen_body(f.read(PROBE_BYTES), rng[1])
+            except RejectedBody:
+                part.unlink(missing_ok=True)  # nothing worth resuming
+                raise
+            print(f"[resume] {url} from byte {offset}")
+            sink = PartFile(part, offset, keep_on_abort=True, limit=self.max_bytes)
+            sink.ext, sink.dims = ext, dims
+            return sink, rng[1]
+
+        # Full body: no Range sent, or If-Range no longer matched
+        length = headers.get("Content-Length") or ""
+        total = int(length) if length.isdigit() and not encoded else None
+        ext, dims = self._screen_body(head, total)
+        validator = if_range_validator(headers)
+        resumable = (
+            total is not None and total >= RESUME_MIN_BYTES and validator is not None
+            and (headers.get("Accept-Ranges") or "").lower() == "bytes"
+        )
+        if resumable:
+            fields = {k: v for k, v in (self.index.get(url) or {}).items() if k not in ("url", "fetched_at", "partial")}
+            fields["partial"] = {
+                "path": part.relative_to(self.images_dir).as_posix(),
+                "total": total,
+                "if_range": validator,
+            }
+            self.index.put(url, **fields)
+        sink = PartFile(part, keep_on_abort=resumable, limit=self.max_bytes)
+        sink.ext, sink.dims = ext, dims
+        sink.write(head)
+        return sink, total
+
+    def _screen_body(self, head: bytes, total: Optional[int]) -> Tuple[str, Optional[Tuple[int, int]]]:
+        """Vet a response by its declared size and first bytes before any of it is
+        kept; returns (extension of the sniffed format, header dimensions if stated)
+        or raises RejectedBody."""
+        self._check_limits(total, None)
+        ext = sniff_image(head)
+        if ext is None:
+            raise RejectedBody(f"not an image (starts with {head[:16]!r})")
+        dims = header_dims(head)
+        self._check_limits(None, dims)
+        return ext, dims
+
+    def _check_limits(self, total: Optional[int], dims: Optional[Tuple[int, int]]) -> None:
+        # --max-bytes / --min-dim / --min-width as currently configured
+        if total is not None and total > self.max_bytes:
+            raise RejectedBody(f"{total} bytes exceeds the {self.max_bytes}-byte cap", {"bytes": total})
+        facts = {"width": dims[0], "height": dims[1]} if dims else None
+        if dims and min(dims) < self.min_dim:
+            raise RejectedBody(f"{dims[0]}x{dims[1]} is below {self.min_dim}px", facts)
+        if dims and dims[0] < self.min_width:
+            raise RejectedBody(f"{dims[0]}px wide is below --min-width {self.min_width}", facts)
+
+    def _reject(self, url: str, e: RejectedBody) -> None:
+        # Size/dimension verdicts are remembered so reruns don't fetch the same junk again.
+        # "Not an image" may be a challenge or error page, so it is retried next run, and a
+        # good copy already on record (e.g. during --revalidate) is never overwritten.
+        entry = self.index.get(url) or {}
+        if e.facts is not None and not entry.get("sha256"):
+            self.index.put(url, rejected=str(e), **e.facts)
+        self.stats.incr("images_rejected")
+        print(f"[reject] {url} ({e})")
+
+    def _write_temp(self, chunks: Iterable[bytes]) -> Tuple[Path, str, int]:
+        # Hash while streaming so the blob address is known the moment the body ends
+        tmp = self.blobs.temp_path()
+        h = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    if chunk:
+                        f.write(chunk)
+                        h.update(chunk)
+                        size += len(chunk)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return tmp, h.hexdigest(), size
+
+    def _commit_download(
+        self, url: str, tmp: Path, digest: str, size: int, fpath: Path, headers,
+        dims: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        blob, created = self.blobs.commit(tmp, digest, fpath.suffix)
+        if not created:
+            self.stats.incr("images_deduped")
+        self.blobs.link(blob, fpath)
+        self._record_download(url, fpath, size, digest, headers, dims)
+
+    def _cached_entry(self, url: str, out_dir: Path) -> Optional[Dict]:
+        # Index entry whose file is still on disk intact, i.e. a known-good copy
+        if self.refresh:
+            return None
+        entry = self.index.get(url)
+        if not entry:
+            return None
+        if entry.get("rejected"):
+            # Judge the recorded size/dimensions against this run's limits; verdicts
+            # recorded without them were "not an image", so try those again
+            dims = (entry["width"], entry["height"]) if "width" in entry else None
+            if "bytes" not in entry and dims is None:
+                return None
+            try:
+                self._check_limits(entry.get("bytes"), dims)
+            except RejectedBody as e:
+                return {**entry, "rejected": str(e)}
+            return None
+        if entry.get("duplicate_of"):
+            # Pruned as a near-duplicate; known-good as long as its representative is
+            return entry if (self.images_dir / entry["duplicate_of"]).is_file() else None
+        if "path" not in entry:
+            return None  # only a partial body so far
+        fpath = self.images_dir / entry["path"]
+        if fpath.parent != out_dir or not fpath.is_file() or fpath.stat().st_size != entry.get("size"):
+            return None
+        return entry
+
+    def _skip_cached(self, entry: Dict) -> None:
+        self.stats.incr("images_skipped")
+        if entry.get("rejected"):
+            print(f"[skip] {entry['url']} (rejected earlier: {entry['rejected']})")
+            return
+        print(f"[skip] {Path(entry['path']).name} (indexed)")
+        # Keep page/text current for the manifest even though the bytes are reused
+        url = entry["url"]
+        meta = {**self.image_meta.get(url, {}), **entry.get("meta", {})}
+        page = entry.get("page") or self.image_pages.get(url)
+        if meta != entry.get("meta", {}) or page != entry.get("page"):
+            fields = {k: v for k, v in entry.items() if k not in ("url", "fetched_at")}
+            self.index.put(url, **{**fields, **({"meta": meta} if meta else {}), **({"page": page} if page else {})})
+
+    def _mark_not_modified(self, entry: Dict, headers) -> None:
+        # 304: keep the file, refresh validators in case the server rotated them
+        fields = {k: v for k, v in entry.items() if k not in ("url", "fetched_at")}
+        fields["etag"] = headers.get("ETag") or entry.get("etag")
+        fields["last_modified"] = headers.get("Last-Modified") or entry.get("last_modified")
+        self.index.put(entry["url"], **fields)
+        self.stats.incr("images_not_modified")
+        print(f"[304] {Path(entry['path']).name}")
+
+    def _record_download(
+        self, url: str, fpath: Path, size: int, sha256: str, headers, dims: Optional[Tuple[int, int]] = None
+    ) -> None:
+        self.index.put(
+            url,
+            path=fpath.relative_to(self.images_dir).as_posix(),
+            size=size,
+            sha256=sha256,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            **({"width": dims[0], "height": dims[1]} if dims else {}),
+            **({"page": self.image_pages[url]} if url in self.image_pages else {}),
+            **({"meta": self.image_meta[url]} if url in self.image_meta else {}),
+        )
+
+    def _image_headers(self, url: str, page_url: str) -> Dict[str, str]:
+        return {
+            "Accept": "image/avif,image/webp,image/*,*/*;q=0.8",
+            "Referer": page_url or (f"{urlparse(url).scheme}://{urlparse(url).hostname}")
+        }
+
+# ------------------------------ Async engine ------------------------------
+
+ASYNC_WORKERS = 16  # default --workers for the async engine; fetches are cheap coroutines
+
+class AsyncImageScraper(ImageScraper):
+    """Same pipeline as ImageScraper, but pages and images are fetched with aiohttp
+    on one event loop. `workers` bounds the number of image fetches in flight."""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def run(self) -> None:
+        links = self._read_links(self.readme_path)
+        if not links:
+            print(f"No links found in {self.readme_path}")
+            return
+
+        print(f"Found {len(links)} URL(s) in {self.readme_path}")
+        asyncio.run(self._run_async(links))
+        self._finish_run()
+
+    async def _run_async(self, links: List[str]) -> None:
+        import aiohttp
+
+        self._sem = asyncio.Semaphore(self.workers)
+        self._queue: "asyncio.Queue[Optional[Tuple[str, Path, str]]]" = asyncio.Queue(max(1, self.queue_size))
+        # Producers block on the bounded queue, so they get their own threads: sharing the
+        # default executor with the consumers' to_thread() calls (the 403 Playwright
+        # fallback) could leave a full queue with no thread free to drain it
+        self._producers = ThreadPoolExecutor(thread_name_prefix="produce")
+        consumers = [asyncio.create_task(self._download_worker()) for _ in range(self.workers)]
+        # Downloads are bounded by the semaphore; the extra slots keep page fetches moving
+        connector = aiohttp.TCPConnector(limit=self.workers + GALLERY_FETCH_WORKERS, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(headers=DEFAULT_HEADERS, connector=connector, timeout=timeout) as session:
+            self._aio = session
+            jobs = []
+            for url in links:
+                src_key = domain_key(url)
+                if not src_key:
+                    print(f"[skip] Unknown/unsupported source for {url}")
+                    continue
+                folder = self.images_dir / SUPPORTED_SOURCES[src_key]
+                jobs.append(self._crawl_page_async(url, src_key, folder))
+            await asyncio.gather(*jobs)
+            for _ in consumers:
+                await self._queue.put(None)
+            await asyncio.gather(*consumers)
+        self._producers.shutdown()
+
+    async def _download_worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if job is None:
+                return
+            try:
+                await self._download_one_async(*job)
+            except Exception as e:
+                print(f"[error] download worker: {e}")
+
+    async def _crawl_page_async(self, url: str, src_key: str, out_dir: Path) -> None:
+        try:
+            await self._scrape_page_async(url, src_key, out_dir)
+        except Exception as e:
+            # One broken page must not abort the gather (and the run's index/browser cleanup)
+            print(f"[error] {url}: {e}")
+
+    async def _scrape_page_async(self, url: str, src_key: str, out_dir: Path) -> None:
+        pending = await self._scrape_one_async(url, src_key, out_dir)
+        seen = {url}
+        wave = self._gallery_wave(pending, seen)
+        while wave:
+            print(f"[info] Following {len(wave)} more gallery page(s) of {url}")
+            found = await asyncio.gather(*(self._scrape_one_async(u, src_key, out_dir) for u in wave))
+            wave = self._gallery_wave([n for links in found for n in links], seen)
+
+    async def _scrape_one_async(self, url: str, src_key: str, out_dir: Path) -> List[str]:
+        print(f"\n[page] {url} -> {out_dir.name}")
+        self.stats.incr("pages_seen")
+
+        html = await self._fetch_html_async(url)
+        loop = asyncio.get_running_loop()
+        ctx = ExtractContext()
+
+        def produce() -> int:
+            # Parsing (and the optional Playwright fallback) is blocking, so it runs in a
+            # thread and hands each URL to the loop's bounded queue as soon as it is found
+            found = 0
+            for u in self._iter_image_urls(url, src_key, html, out_dir, ctx):
+                found += 1
+                self.stats.incr("images_found")
+                asyncio.run_coroutine_threadsafe(self._queue.put((u, out_dir, url)), loop).result()
+            return found
+
+        found = await loop.run_in_executor(self._producers, produce)
+        if not found:
+            print(f"[warn] No new images found on {url}")
+        else:
+            print(f"[info] Found {found} image URL(s) on {url}")
+        return gallery_links(url, ctx.pages) if self.max_pages > 1 else []
+
+    async def _get_with_retries(self, url: str, headers: Dict[str, str]):
+        # Mirrors the urllib3 Retry policy used by the sync session
+        attempt = 0
+        while True:
+            try:
+                resp = await self._aio.get(url, headers=headers)
+            except Exception:
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if resp.status not in self.RETRY_STATUSES or attempt >= self.max_retries:
+                    return resp
+                resp.release()
+            await asyncio.sleep(0.5 * (2 ** attempt))
+            attempt += 1
+
+    async def _fetch_html_async(self, url: str) -> Optional[str]:
+        entry, cached = self._cached_page(url)
+        await self.limiter.acquire_async(url)
+        try:
+            resp = await self._get_with_retries(url, conditional_headers(entry))
+            async with resp:
+                if resp.status == 304 and cached is not None:
+                    print(f"[info] Page not modified; using cached copy of {url}")
+                    return cached
+                resp.raise_for_status()
+                text = await resp.text(errors="replace")
+                self._store_page(url, text, resp.headers)
+                return text
+        except Exception as e:
+            print(f"[warn] Failed to fetch HTML: {e}")
+            return None
+
+    async def _download_one_async(self, url: str, out_dir: Path, page_url: str = "") -> None:
+        entry = self._cached_entry(url, out_dir)
+        if entry and (not self.revalidate or entry.get("rejected")):
+            self._skip_cached(entry)
+            return
+        part = self.blobs.part_path(url, out_dir)
+        offset, resume = (0, {}) if entry else self._resume_from(url, part)
+        async with self._sem:
+            await self.limiter.acquire_async(url)
+            try:
+                headers = {**self._image_headers(url, page_url), **conditional_headers(entry), **resume}
+                resp = await self._get_with_retries(url, headers)
+                async with resp:
+                    if resp.status == 304 and entry:
+                        self._mark_not_modified(entry, resp.headers)
+                        return
+                    if resp.status == 416:
+                        part.unlink(missing_ok=True)
+                    resp.raise_for_status()
+                    head = b""
+                    while resp.status != 206 and head_wanted(head):
+                        chunk = await resp.content.read(min(8 * 1024, head_wanted(head)))
+                        if not chunk:
+                            break
+                        head += chunk
+                    # Disk work (re-hashing a resumed .part, writes, the blob commit) runs
+                    # off the loop so one large body doesn't stall every other fetch
+                    try:
+                        sink, total = await asyncio.to_thread(
+                            self._open_part, url, part, offset, resp.status, resp.headers, head)
+                    except RejectedBody:
+                        resp.close()  # drop the connection instead of draining the rest
+                        raise
+                    fpath = out_dir / (sha1_name(url) + sink.ext)
+                    try:
+                        async for chunk in resp.content.iter_chunked(64 * 1024):
+                            await asyncio.to_thread(sink.write, chunk)
+                        digest = await asyncio.to_thread(sink.finish, total)
+                    except BaseException:
+                        sink.abort()
+                        raise
+                    await asyncio.to_thread(
+                        self._commit_download, url, part, digest, sink.size, fpath, resp.headers, sink.dims)
+                self.stats.incr("images_downloaded")
+                print(f"[save] {fpath.name}")
+                return
+            except RejectedBody as e:
+                self._reject(url, e)
+                return
+            except Exception as e:
+                self.stats.incr("images_failed")
+                print(f"[fail] {url} -> {e}")
+                blocked = any(code in str(e) for code in ("403", "406"))
+        if self.use_playwright and blocked:
+            ok = await asyncio.to_thread(self._playwright_download, url, out_dir, page_url)
+            if ok:
+                self.stats.incr("images_failed", -1)
+                self.stats.incr("images_downloaded")
 
 # ------------------------------ CLI ------------------------------
+def parse_rate_spec(spec: str) -> Tuple[str, Tuple[float, float]]:
+    """Parse HOST_PATTERN=RATE[:BURST], e.g. '*.yelpcdn.com=20:40'."""
+    try:
+        pattern, limits = spec.split("=", 1)
+        rate, _, burst = limits.partition(":")
+        rate_f = float(rate)
+        return pattern.strip().lower(), (rate_f, float(burst) if burst else max(1.0, rate_f))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid rate spec {spec!r}; expected HOST_PATTERN=RATE[:BURST]")
+
 def parse_args(argv: Optional[List[str]] = None):
     ap = argparse.ArgumentParser(description="Image Scraper: download images from URLs in a markdown file.")
     ap.add_argument("--readme", default="Links.md", type=Path, help="Path to README/Links markdown file (default: Links.md)")
     ap.add_argument("--images-dir", default=Path("images"), type=Path, help="Output images directory (default: ./images)")
     ap.add_argument("--no-playwright", action="store_true", help="Disable Playwright fallback even if installed")
-    ap.add_argument("--delay", type=float, default=0.5, help="Delay between requests/downloads in seconds (default: 0.5)")
+    ap.add_argument("--browser-pages", type=int, default=2, help="Max concurrent Playwright pages in the shared browser (default: 2)")
+    ap.add_argument("--pw-capture", action="store_true",
+                    help="Save images from the Playwright page's network responses instead of re-downloading them")
+    ap.add_argument("--pw-load-all", action="store_true",
+                    help="Let Playwright pages load fonts, CSS, media and trackers (blocked by default)")
+    ap.add_argument("--delay", type=float, default=0.5, help="Delay between requests to the same host in seconds (default: 0.5)")
+    ap.add_argument("--rate", type=parse_rate_spec, action="append", default=[], metavar="HOST_PATTERN=RATE[:BURST]",
+                    help="Per-host requests/sec override, repeatable (e.g. '*.yelpcdn.com=20:40')")
     ap.add_argument("--timeout", type=int, default=20, help="HTTP timeout seconds (default: 20)")
     ap.add_argument("--retries", type=int, default=3, help="Max HTTP retries for requests (default: 3)")
+    ap.add_argument("--workers", type=int, default=None,
+                    help=f"Concurrent image downloads; politeness delay applies per host (default: 1, or {ASYNC_WORKERS} with --engine async)")
+    ap.add_argument("--page-workers", type=int, default=1,
+                    help="Sources crawled concurrently, each with its own per-host politeness (default: 1)")
+    ap.add_argument("--max-pages", type=int, default=1,
+                    help="Follow gallery pagination (Yelp ?start=N, NorthJersey next slide) up to N pages per link (default: 1)")
+    ap.add_argument("--queue-size", type=int, default=256,
+                    help="Max image URLs waiting between extraction and the downloaders (default: 256)")
+    ap.add_argument("--min-dim", type=int, default=32,
+                    help="Reject images whose header says either side is below this many pixels (default: 32)")
+    ap.add_argument("--min-width", type=int, default=0,
+                    help="Probe each image's header bytes and drop it without the body if narrower than this, e.g. 600 (default: off)")
+    ap.add_argument("--max-bytes", type=int, default=25 * 1024 * 1024,
+                    help="Abort image bodies larger than this many bytes (default: 25 MiB)")
+    ap.add_argument("--refresh", action="store_true", help="Ignore the download index and re-fetch every page and image")
+    ap.add_argument("--revalidate", action="store_true", help="Revalidate indexed images with ETag/If-Modified-Since instead of skipping them")
+    ap.add_argument("--near-dupes", type=int, nargs="?", const=6, default=None, metavar="DISTANCE",
+                    help="Prune perceptual near-duplicates within DISTANCE bits of dHash (default when given: 6; needs Pillow)")
+    ap.add_argument("--max-width", type=int, default=1600, help="Widest srcset candidate to prefer per image (default: 1600)")
+    ap.add_argument("--prefer-format", default=",".join(DEFAULT_FORMAT_PREFERENCE),
+                    help="Comma-separated format preference for srcset/<picture> picks (default: %(default)s)")
+    ap.add_argument("--all-variants", action="store_true",
+                    help="Download every srcset/<picture> candidate and CDN size variant instead of one per image")
+    ap.add_argument("--placeholders", action="store_true",
+                    help="Write a BlurHash and tiny base64 LQIP per kept image to images/placeholders.json (needs Pillow + NumPy)")
+    ap.add_argument("--match-menu", type=Path, nargs="?", const=Path("data/menu.json"), default=None, metavar="MENU_JSON",
+                    help="Propose an image per menu item id as a JSON Patch in images/ (default when given: data/menu.json)")
+    ap.add_argument("--match-threshold", type=float, default=0.6, help="Minimum confidence for --match-menu proposals (default: 0.6)")
+    ap.add_argument("--public-prefix", default="/public/images",
+                    help="Site path the images dir is served under, used for --match-menu image values (default: /public/images)")
+    ap.add_argument("--optimize", action="store_true",
+                    help="Render a responsive AVIF/WEBP/JPEG width ladder for every kept image (needs Pillow)")
+    ap.add_argument("--variant-widths", default=",".join(map(str, VARIANT_WIDTHS)),
+                    help="Comma-separated widths for --optimize; never upscaled (default: %(default)s)")
+    ap.add_argument("--variant-formats", default=",".join(VARIANT_FORMATS),
+                    help="Comma-separated output formats for --optimize (default: %(default)s)")
+    ap.add_argument("--optimize-dir", type=Path, default=None, help="Where --optimize writes (default: <images-dir>/optimized)")
+    ap.add_argument("--optimize-procs", type=int, default=0, help="Processes for --optimize (default: all cores)")
+    ap.add_argument("--parser", choices=PARSER_BACKENDS, default="html.parser", help="HTML parser backend (default: html.parser)")
+    ap.add_argument("--strained", action="store_true", help="Only materialize img/source/meta/picture and styled elements while parsing")
+    ap.add_argument("--benchmark-parsers", nargs="*", type=Path, metavar="HTML",
+                    help="Benchmark parser backends on saved pages (default: cached pages) and exit")
+    ap.add_argument("--engine", choices=("sync", "async"), default="sync", help="HTTP engine: requests threads or aiohttp event loop (default: sync)")
     return ap.parse_args(argv)
 
 def main(argv: Optional[List[str]] = None) -> int:
     args = parse_args(argv)
-    scraper = ImageScraper(
+    scraper_cls = ImageScraper
+    if args.engine == "async":
+        try:
+            import aiohttp  # noqa: F401
+            scraper_cls = AsyncImageScraper
+        except Exception as e:
+            print(f"[warn] aiohttp not available ({e}); using sync engine")
+    scraper = scraper_cls(
         readme_path=args.readme,
         images_dir=args.images_dir,
         use_playwright=(False if args.no_playwright else None),
         delay_sec=args.delay,
         timeout=args.timeout,
         max_retries=args.retries,
+        workers=args.workers if args.workers is not None else (ASYNC_WORKERS if scraper_cls is AsyncImageScraper else 1),
+        page_workers=args.page_workers,
+        queue_size=args.queue_size,
+        max_pages=args.max_pages,
+        min_dim=args.min_dim,
+        max_bytes=args.max_bytes,
+        min_width=args.min_width,
+        placeholders=args.placeholders,
+        menu_path=args.match_menu,
+        match_threshold=args.match_threshold,
+        public_prefix=args.public_prefix,
+        optimize=args.optimize,
+        variant_widths=[int(w) for w in args.variant_widths.split(",") if w.strip()],
+        variant_formats=[f.strip().lower() for f in args.variant_formats.split(",") if f.strip()],
+        optimize_dir=args.optimize_dir,
+        optimize_procs=args.optimize_procs or None,
+        host_rates=dict(args.rate),
+        refresh=args.refresh,
+        revalidate=args.revalidate,
+        near_dup_distance=args.near_dupes,
+        max_width=args.max_width,
+        prefer_formats=[f.strip().lower() for f in args.prefer_format.split(",") if f.strip()],
+        all_variants=args.all_variants,
+        parser=args.parser,
+        strained=args.strained,
+        browser_pages=args.browser_pages,
+        pw_capture=args.pw_capture,
+        block_resources=not args.pw_load_all,
     )
+    if args.benchmark_parsers is not None:
+        scraper.benchmark_parsers(args.benchmark_parsers)
+        return 0
     scraper.run()
     return 0
 